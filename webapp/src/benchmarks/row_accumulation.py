@@ -0,0 +1,60 @@
+""" Benchmark comparing data frame row appends with column accumulation.
+
+    Usage (from webapp/src):  python -m benchmarks.row_accumulation --rows 100000
+"""
+import time
+from datetime import datetime
+import click
+import pandas as pd
+from commands.from_space import FromSpaceCommand
+from utils.column_accumulator import ColumnAccumulator
+
+def build_row(index : int) -> list:
+    """ Builds a representative analysis row.
+
+        index - row number
+    """
+    return [f"space/raw/file_{index // 1000}.jsonl",
+            index % 1000 + 1,
+            f"server{index % 250}.example.com",
+            f"Summary of incident number {index}",
+            f"Subcategory {index % 40}",
+            index % 2 == 0,
+            index % 3 == 0,
+            "Closed",
+            datetime(2025, 1 + index % 12, 1 + index % 28, 12, 0, 0),
+            None
+            ]
+
+def append_with_loc(columns : list[str], row_count : int) -> pd.DataFrame:
+    """ Grows a data frame one row at a time (prior implementation). """
+    df = pd.DataFrame([], columns=columns)
+    for index in range(row_count):
+        df.loc[len(df)] = build_row(index)
+    return df
+
+def append_with_accumulator(columns : list[str], row_count : int) -> pd.DataFrame:
+    """ Accumulates columns and materializes the data frame once. """
+    rows = ColumnAccumulator(columns)
+    for index in range(row_count):
+        rows.append(build_row(index))
+    return rows.to_dataframe()
+
+@click.command()
+@click.option("--rows", "row_count", default=100000, help="Number of rows to accumulate.")
+@click.option("--loc-rows", "loc_row_count", default=2000,
+              help="Number of rows for the DataFrame.loc strategy, which grows quadratically.")
+def benchmark(row_count : int, loc_row_count : int):
+    """ Times both accumulation strategies for the analysis columns. """
+    columns = FromSpaceCommand().ANALYSIS_COLUMNS
+
+    for name, strategy, rows in [("ColumnAccumulator", append_with_accumulator, row_count),
+                                 ("DataFrame.loc append", append_with_loc, loc_row_count)]:
+        start = time.perf_counter()
+        df = strategy(columns, rows)
+        elapsed = time.perf_counter() - start
+        click.echo(f"{name:>22}: {elapsed:8.2f}s for {len(df):>7} rows " \
+                   f"({elapsed / len(df) * 1000000:10.1f}us per row)")
+
+if __name__ == '__main__':
+    benchmark()    # pylint: disable=no-value-for-parameter
@@ -0,0 +1,38 @@
+""" Command for Deleting an Evaluation Space in web UI. """
+import logging
+from typing import Any, Callable, Optional
+from pydantic import BaseModel
+from gateways.object_storage_gateway import ObjectStorageGateway
+from utils.space_index import remove_from_space_index
+
+logger = logging.getLogger(__name__)
+
+class DeleteSpaceCommand(BaseModel):
+    """ Command processor for the Delete Evaluation Space action."""
+
+    # input parameters
+    space_id : str = None
+    fn_progress : Optional[Callable[[int, int], Any]] = None
+
+    # output responses
+    failed_keys : list[str] = []
+
+    def go(self):
+        """ Execute the command. """
+
+        # validate input parameters
+        if self.space_id is None or len(self.space_id) == 0:
+            msg = "Space ID is a Required Value and Cannot be Empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # purge all files in the space
+        gateway = ObjectStorageGateway()
+        self.failed_keys = gateway.delete_root_dir(self.space_id, self.fn_progress)
+
+        # only remove the space from the index once its metadata is gone
+        if len(self.failed_keys) == 0:
+            remove_from_space_index(self.space_id)
+        else:
+            logger.error("Space was only partially deleted.  Space=%s Failed=%s",
+                         self.space_id, len(self.failed_keys))
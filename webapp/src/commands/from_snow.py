@@ -1,21 +1,40 @@
 """ CLI Command for Analyzing Incidents directly from Service Now. """
 import logging
 import json
-from datetime import date, timedelta
+import itertools
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Optional
 from pydantic import BaseModel
 from gateways.snow_gateway import ServiceNowGateway
 from gateways.object_storage_gateway import ObjectStorageGateway
+from utils.settings import settings
+from utils.space_metadata import load_metadata, save_metadata
+from utils.dedup_index import row_identity, update_dedup_index
+from metadata.snow_sync_cursor import SnowSyncCursor
 
 logger = logging.getLogger(__name__)
 
 class FromServiceNowCommand(BaseModel):
     """ Command processor for the From SNOW action in the CLI."""
 
+    # constants
+    FIELD_SYS_ID : str = "sys_id"
+    FIELD_NUMBER : str = "number"
+    FIELD_UPDATED_ON : str = "sys_updated_on"
+
     # input parameters
     space_id : str = None
     min_create_date : date = None
     max_create_date : date = None
     row_limit : int = -1
+    field_profile : str = settings.SERVICE_NOW_FIELD_PROFILE
+    incremental : bool = False
+    fn_progress : Optional[Callable[[int, int], Any]] = None
+
+    # output responses
+    row_count : int = 0
+    duplicate_count : int = 0
+    sync_cursor : Optional[SnowSyncCursor] = None
 
     def go(self):
         """ Execute the command. """
@@ -24,46 +43,144 @@ class FromServiceNowCommand(BaseModel):
             msg = "Space ID is a required field but is empty!"
             logger.error(msg)
             raise ValueError(msg)
-        if self.min_create_date is None and self.max_create_date is None:
-            msg = "At least one filter parameter must be specifiied and all are empty!"
-            logger.error(msg)
-            raise ValueError(msg)
         if self.row_limit is None or self.row_limit < -1:
             msg = f"Invalid row limit provided: {self.row_limit}"
             logger.error(msg)
             raise ValueError(msg)
 
+        # incremental syncs continue from the high-water mark of the last pull
         gateway = ServiceNowGateway()
+        metadata = load_metadata(self.space_id)
+        prior_cursor = metadata.snow_sync_cursor
+        since = None
+        if prior_cursor is not None and len(prior_cursor.updated_on) > 0:
+            since = gateway.parse_datetime(prior_cursor.updated_on)
+            if since is None:
+                logger.warning("Ignoring sync cursor not in the raw ServiceNow format.  Cursor=%s",
+                               prior_cursor.updated_on)
+                prior_cursor = None
+        since_cursor = self.incremental and since is not None
+        if not since_cursor and self.min_create_date is None and self.max_create_date is None:
+            msg = "At least one filter parameter must be specifiied and all are empty!"
+            logger.error(msg)
+            raise ValueError(msg)
 
-        # build query
-        query = ""
-        if self.min_create_date is not None:
-            query += gateway.SNOW_FILTER_CREATE_DATE + ">=" + gateway.date_to_string(self.min_create_date)
-        if self.max_create_date is not None:
-            if len(query) > 0:
-                query += "&"
-            query += gateway.SNOW_FILTER_CREATE_DATE + "<" + gateway.date_to_string(self.max_create_date + timedelta(days=1))
+        # build query (encoded query conditions are joined with '^')
+        conditions = []
+        if since_cursor:
+            # re-read a short window before the cursor to catch incidents committed late with
+            # an earlier timestamp, incidents pulled by the last sync are skipped below
+            window_start = since - timedelta(seconds=settings.SERVICE_NOW_SYNC_LOOKBACK_SECONDS)
+            conditions.append(self.FIELD_UPDATED_ON + ">=" + gateway.datetime_to_string(window_start))
+        else:
+            if self.min_create_date is not None:
+                conditions.append(gateway.SNOW_FILTER_CREATE_DATE + ">=" + gateway.date_to_string(self.min_create_date))
+            if self.max_create_date is not None:
+                conditions.append(gateway.SNOW_FILTER_CREATE_DATE + "<" + gateway.date_to_string(self.max_create_date + timedelta(days=1)))
+        query = gateway.SNOW_QUERY_AND.join(conditions)
         logger.info("SNOW Query: %s", query)
 
-        # build parameters list
-        parameters = {}
+        # build parameters list, limiting the pull to the fields of the profile
+        parameters = gateway.build_field_parameters(self.field_profile)
         parameters[gateway.SNOW_QUERY] = query
-        if self.row_limit is not None and self.row_limit > 0:
-            parameters[gateway.SNOW_LIMIT] = str(self.row_limit)
 
-        # query service now
-        results = gateway.query_snow(parameters)
-        logger.debug("SNOW Query Results: %s", results)
+        # query service now a page at a time, skipping incidents already pulled
+        self.sync_cursor = prior_cursor.model_copy(deep=True) if prior_cursor else SnowSyncCursor()
+        if since_cursor:
+            # sys_updated_on changes while paging, so page from the last incident read
+            # rather than by offset
+            pages = gateway.iter_keyset_pages(parameters, self.FIELD_UPDATED_ON,
+                                              self.row_limit, self.fn_progress)
+        else:
+            pages = gateway.iter_query_pages(parameters, self.row_limit, self.fn_progress)
+        pages = (page for page in self.dedup_pages(gateway, pages, prior_cursor if since_cursor else None)
+                 if len(page) > 0)
+
+        # nothing new since the last sync is not an error
+        first_page = next(pages, None)
+        if first_page is None and since_cursor:
+            logger.info("No new or updated incidents since last sync.  Cursor=%s",
+                        prior_cursor.updated_on)
+        else:
+            self.push_to_object_storage(itertools.chain([] if first_page is None else [first_page],
+                                                        pages))
+        logger.info("SNOW Query Results.  Rows=%s Duplicates=%s", self.row_count, self.duplicate_count)
 
-        self.push_to_object_storage(results["result"])
+        # advance the sync cursor once the pull is saved, unless a row limit truncated it
+        if since_cursor or self.row_limit is None or self.row_limit <= 0:
+            self.trim_sync_cursor(gateway)
+            self.sync_cursor.last_sync_date = datetime.now()
+            metadata = load_metadata(self.space_id)
+            metadata.snow_sync_cursor = self.sync_cursor
+            save_metadata(metadata)
 
-    def push_to_object_storage(self, results):
-        """ Save the provided data set back to object storage.
+    def dedup_pages(self, gateway : ServiceNowGateway, pages, prior_cursor : SnowSyncCursor = None):
+        """ Removes incidents already pulled from the pages and advances the sync cursor.
+            Timestamps are compared as UTC datetimes and kept in the raw ServiceNow format.
 
-            results - service now query output
+            gateway - service now gateway
+            pages - iterable of pages of service now query output
+            prior_cursor - cursor of the last sync (None to keep every incident)
+        """
+        seen = {}
+        high_water_mark = gateway.parse_datetime(self.sync_cursor.updated_on)
+        for page in pages:
+            rows = []
+            for row in page:
+                key = row.get(self.FIELD_SYS_ID) or row.get(self.FIELD_NUMBER)
+                updated_on = gateway.parse_datetime(row.get(self.FIELD_UPDATED_ON))
+                updated_on_str = gateway.datetime_to_string(updated_on) if updated_on else None
+
+                # skip incidents pulled by the last sync that have not changed since
+                if prior_cursor is not None and updated_on_str is not None and \
+                        prior_cursor.recent_ids.get(key) == updated_on_str:
+                    self.duplicate_count += 1
+                    continue
+
+                # skip incidents repeated within this pull, keeping copies updated mid-pull
+                if key is not None:
+                    version = updated_on_str or row.get(self.FIELD_UPDATED_ON)
+                    if key in seen and seen[key] == version:
+                        self.duplicate_count += 1
+                        continue
+                    seen[key] = version
+                rows.append(row)
+
+                # track the high-water mark
+                if updated_on is None:
+                    continue
+                if high_water_mark is None or updated_on > high_water_mark:
+                    high_water_mark = updated_on
+                    self.sync_cursor.updated_on = updated_on_str
+                if key is not None:
+                    self.sync_cursor.recent_ids[key] = updated_on_str
+            yield rows
+
+    def trim_sync_cursor(self, gateway : ServiceNowGateway):
+        """ Forgets incidents that fall outside of the lookback window of the sync cursor.
+
+            gateway - service now gateway
+        """
+        high_water_mark = gateway.parse_datetime(self.sync_cursor.updated_on)
+        if high_water_mark is None:
+            self.sync_cursor.recent_ids = {}
+            return
+        # raw timestamps are zero padded so they sort in time order as strings
+        window_start = high_water_mark - timedelta(seconds=settings.SERVICE_NOW_SYNC_LOOKBACK_SECONDS)
+        window_start_str = gateway.datetime_to_string(window_start)
+        self.sync_cursor.recent_ids = {key: updated_on
+                                       for key, updated_on in self.sync_cursor.recent_ids.items()
+                                       if updated_on >= window_start_str}
+
+    def push_to_object_storage(self, pages):
+        """ Streams the provided data set back to object storage as it is extracted.
+
+            pages - iterable of pages of service now query output
         """
         # validate inputs
-        if results is None or len(results) == 0:
+        pages = (page for page in pages if len(page) > 0)
+        first_page = next(pages, None)
+        if first_page is None or len(first_page) == 0:
             msg = "Cannot save empty result set from Service Now!"
             logger.error(msg)
             raise ValueError(msg)
@@ -71,22 +188,32 @@ class FromServiceNowCommand(BaseModel):
         # build filename
         today = date.today().strftime("%m-%d-%Y")
         filename = f"snow_query_{today}"
-        if self.min_create_date is not None:
-            filename += "_from_" + self.min_create_date.strftime("%m-%d-%Y")
-        if self.max_create_date is not None:
-            filename += "_to_" + self.max_create_date.strftime("%m-%d-%Y")
+        if self.incremental:
+            filename = "snow_sync_" + datetime.now().strftime("%m-%d-%Y_%H-%M-%S")
+        else:
+            if self.min_create_date is not None:
+                filename += "_from_" + self.min_create_date.strftime("%m-%d-%Y")
+            if self.max_create_date is not None:
+                filename += "_to_" + self.max_create_date.strftime("%m-%d-%Y")
         if self.row_limit is not None and self.row_limit > 0:
             filename += "_limit_" + str(self.row_limit)
 
         # beautify json
         #results_str = json.dumps(results, indent=4)
 
-        # create jsonl
-        jsonl = ""
-        for row in results:
-            jsonl += json.dumps(row) + "\n"
+        # create jsonl a page at a time, noting the identity of each incident
+        self.row_count = 0
+        identities = []
+        def iter_jsonl():
+            for page in itertools.chain([first_page], pages):
+                self.row_count += len(page)
+                identities.extend(row_identity(row) for row in page)
+                yield "".join(json.dumps(row) + "\n" for row in page)
 
-        # upload file
+        # stream file
         gateway = ObjectStorageGateway()
         path = f"{self.space_id}/raw/{filename}.jsonl"
-        gateway.upload(path, jsonl)
+        gateway.upload_stream(path, iter_jsonl())
+
+        # index incidents so copies pulled by overlapping queries are analyzed once
+        update_dedup_index(self.space_id, path, identities)
@@ -7,11 +7,19 @@ from pathlib import Path
 from pydantic import BaseModel, ConfigDict
 import pandas as pd
 from commands.from_string import FromStringCommand
+from commands.from_string_batch import FromStringBatchCommand
 from gateways.inference_gateway import InferenceGateway
 from gateways.object_storage_gateway import ObjectStorageGateway
 from utils.get_prompt import prompts
 from utils.space_metadata import load_metadata, save_metadata
 from utils.settings import settings
+from utils.bounded_executor import ordered_map, batched
+from utils.llm_cache import llm_cache
+from utils.column_accumulator import ColumnAccumulator
+from utils.space_analysis import save_analysis, load_analysis, read_analysis_csv
+from utils.heat_map_rollups import save_heat_map_rollups
+from utils.dedup_index import load_dedup_indexes, find_duplicates, indexed_rows
+from metadata.dedup_index import DedupIndex
 from metadata.evaluation_space import EvaluationSpaceMetadata
 
 logger = logging.getLogger(__name__)
@@ -24,19 +32,46 @@ class FromSpaceCommand(BaseModel):
     COLUMN_AI_CATEGORY : str = "Category"
     COLUMN_AI_SUBCATEGORY : str = "Subcategory"
     UNKNOWN_CATEGORY : str = "Unspecified by AI"
+    CHECKPOINT_DIR : str = "checkpoints"
+    CHECKPOINT_PREFIX : str = "shard_"
+    CHECKPOINT_FINGERPRINT_COLUMN : str = "Incident_File_Fingerprint"
+    ANALYSIS_COLUMNS : list[str] = ["Incident_File",
+                                    "Row",
+                                    "Asset",
+                                    "Summary",
+                                    "Subcategory",
+                                    "Is_Manual",
+                                    "Is_Outage",
+                                    "Status",
+                                    "Date_Reported",
+                                    "Date_Resolved"
+                                    ]
+    TEXT_COLUMNS : list[str] = ["Asset", "Summary", "Subcategory", "Status"]
 
     # config
     MAX_RETRIES : int = 5
     files_to_skip : list[str] = []
+    concurrency : int = settings.ANALYSIS_CONCURRENCY
+    checkpoint_interval : int = settings.ANALYSIS_CHECKPOINT_INTERVAL
+    batch_size : int = settings.ANALYSIS_BATCH_SIZE
+    resume : bool = True
 
     # input parameters
     space_id : str = None
+    incremental : bool = False
 
     # output parameters
     analysis : pd.DataFrame = None
     summary_prompt : str = None
     summary : str = None
     metadata : EvaluationSpaceMetadata = None
+    raw_file_fingerprints : dict[str, str] = {}
+    duplicate_count : int = 0
+
+    # working state
+    prior_row_count : int = 0
+    dedup_indexes : list[DedupIndex] = []
+    duplicates : set = set()
 
     def go(self):
         """ Execute the command. """
@@ -51,17 +86,9 @@ class FromSpaceCommand(BaseModel):
 
         # list files in space
         raw_files = []
-        all_files = gateway.list()
-        for file in all_files:
-            # break the file into parts
-            path_object = Path(file)
-            parts = path_object.parts
-
-            if parts is not None and \
-                len(parts) == 3 and \
-                parts[0] == self.space_id and \
-                parts[1] == "raw":
-                raw_files.append(file)
+        raw_file_objects = gateway.list_objects(f"{self.space_id}/raw/", delimiter="/")
+        for raw_file_object in raw_file_objects:
+            raw_files.append(raw_file_object.key)
 
         # validate that at least one file exists
         if len(raw_files) == 0:
@@ -70,65 +97,308 @@ class FromSpaceCommand(BaseModel):
             raise ValueError(msg)
         logger.info("# of files found in space '%s': %s", self.space_id, len(raw_files))
 
-        df = pd.DataFrame([], columns=["Incident_File", 
-                                       "Row",
-                                       "Asset",
-                                       "Summary",
-                                       "Subcategory",
-                                       "Is_Manual",
-                                       "Is_Outage",
-                                       "Status",
-                                       "Date_Reported",
-                                       "Date_Resolved"
-                                       ])
-
-        # process each file
+        # fingerprint raw files to detect new and modified files
+        self.raw_file_fingerprints = {}
+        for raw_file_object in raw_file_objects:
+            self.raw_file_fingerprints[raw_file_object.key] = raw_file_object.fingerprint()
+
+        # find superseded copies of incidents imported more than once
+        self.dedup_indexes = load_dedup_indexes(self.space_id, raw_files)
+        self.duplicates = find_duplicates(self.dedup_indexes)
+        self.duplicate_count = 0
+        logger.info("Superseded incident copies in space.  Space=%s Duplicates=%s",
+                    self.space_id, len(self.duplicates))
+
+        # in incremental mode, keep prior results for unchanged files
+        files_to_process = raw_files
+        prior_df = None
+        if self.incremental:
+            files_to_process, prior_df = self.load_prior_analysis(raw_files)
+            if len(files_to_process) == 0 and prior_df is not None and \
+                    len(prior_df) == self.prior_row_count:
+                logger.info("No new, modified or deleted raw files.  Analysis is up to date.")
+                return
+
+        # resume from checkpoint shards left behind by an interrupted run
+        resumed_df, completed = self.load_checkpoints(gateway, files_to_process)
+        next_shard = self.next_checkpoint_shard(gateway)
+
+        # rows kept from the prior analysis are not classified again
+        if prior_df is not None:
+            completed = completed | set(zip(prior_df["Incident_File"], prior_df["Row"]))
+
+        # classify incidents concurrently while preserving file and row order
+        logger.info("Classifying incidents.  Concurrency=%s Batch Size=%s",
+                    self.concurrency, self.batch_size)
+        incidents = self.iter_incidents(gateway, files_to_process, completed)
+        batches = batched(incidents, self.batch_size)
+        rows = ColumnAccumulator(self.ANALYSIS_COLUMNS)
+        pending_rows = []
+        try:
+            for results in ordered_map(self.classify_incidents, batches, self.concurrency):
+                for file, row_index, command in results:
+                    # append row
+                    row = [file,
+                           row_index,
+                           command.asset_name,
+                           command.summary,
+                           command.category,
+                           command.is_manual,
+                           command.is_outage,
+                           command.status,
+                           command.date_reported,
+                           command.date_resolved
+                           ]
+                    rows.append(row)
+
+                    # periodically persist completed rows
+                    pending_rows.append(row)
+                    if len(pending_rows) >= self.checkpoint_interval:
+                        self.save_checkpoint(gateway, next_shard, pending_rows)
+                        next_shard += 1
+                        pending_rows = []
+        finally:
+            # persist the final partial shard before the summarization steps, and keep the
+            # rows completed so far when classification fails part way
+            if len(pending_rows) > 0:
+                self.save_checkpoint(gateway, next_shard, pending_rows)
+        logger.info("LLM cache statistics: %s", llm_cache.stats())
+        if self.duplicate_count > 0:
+            logger.info("Skipped superseded incident copies.  Space=%s Duplicates=%s",
+                        self.space_id, self.duplicate_count)
+
+        # merge prior results for unchanged files with resumed and new results
+        frames = [prior_df, resumed_df, rows.to_dataframe()]
+        frames = [frame for frame in frames if frame is not None and len(frame) > 0]
+        if len(frames) == 0:
+            msg = f"No incidents found in space/raw: {self.space_id}"
+            logger.error(msg)
+            raise ValueError(msg)
+        df = pd.concat(frames, ignore_index=True)
+
+        # restore file and row order across prior, resumed and newly classified rows
+        df = df.sort_values(by=["Incident_File", "Row"], kind="stable", ignore_index=True)
+
+        # Augment data frame with new column for category
+        df = self.generalize_subcategories(df)
+
+        # Summarize analysis
+        self.summarize_analysis(df)
+
+        # save analysis as parquet along with a CSV export
+        self.analysis = save_analysis(self.space_id, df)
+
+        # precompute the daily counts behind the heat maps
+        save_heat_map_rollups(self.space_id, self.analysis)
+
+        # record the analyzed files only once the analysis has been saved
+        self.update_space()
+
+        # analysis is complete so checkpoints are no longer needed
+        self.delete_checkpoints(gateway)
+
+    def iter_incidents(self, gateway, raw_files, completed):
+        """ Generates the (file, row, line) tuple for every incident in the raw files,
+            skipping copies of an incident superseded by a newer copy.
+
+            gateway - object storage gateway
+            raw_files - list of raw files to process
+            completed - set of (file, row) tuples already classified
+        """
         for file in raw_files:
             if os.path.basename(file) in self.files_to_skip:
                 logger.warning("Skipping file...   Filename=%s", file)
             else:
                 logger.info("Processing file: %s", file)
 
-                # load file
-                logger.info("Loading File: %s", file)
-                contents = gateway.download(file)
-
-                # process each line in th efile
-                contents_lines = contents.splitlines()
+                # process each line in the file as it is streamed
                 row_index : int = 0
-                for line in contents_lines:
+                for line in gateway.iter_lines(file):
                     row_index += 1
+                    if (file, row_index) in completed:
+                        continue
+                    if (file, row_index) in self.duplicates:
+                        self.duplicate_count += 1
+                        continue
+                    yield (file, row_index, line)
 
-                    # execute file processing command
-                    command = FromStringCommand()
-                    command.input_str = line
-                    command.go()
+    def classify_incidents(self, batch):
+        """ Classifies a batch of incidents.  Invoked concurrently from the worker pool.
 
-                    # append row
-                    df.loc[len(df)] = [file,
-                                       row_index,
-                                       command.asset_name,
-                                       command.summary,
-                                       command.category,
-                                       command.is_manual,
-                                       command.is_outage,
-                                       command.status,
-                                       command.date_reported,
-                                       command.date_resolved
-                                       ]
+            batch - tuple of (file, row, line) tuples
 
-        # Augment data frame with new column for category
-        df = self.generalize_subcategories(df)
+            Returns: list of (file, row, command) tuples
+        """
+        # classify single incidents directly
+        if len(batch) == 1:
+            file, row_index, line = batch[0]
+            command = FromStringCommand()
+            command.input_str = line
+            command.go()
+            return [(file, row_index, command)]
+
+        # classify several incidents with a batched analysis request
+        command = FromStringBatchCommand()
+        command.input_strs = [line for _, _, line in batch]
+        command.go()
+
+        results = []
+        for (file, row_index, _), result in zip(batch, command.results):
+            results.append((file, row_index, result))
+        return results
+
+    def list_checkpoints(self, gateway):
+        """ Lists the checkpoint shards saved for the space in shard order.
+
+            gateway - object storage gateway
+        """
+        checkpoints = gateway.list(f"{self.space_id}/{self.CHECKPOINT_DIR}/")
+        return sorted(checkpoints)
 
-        self.analysis = df
+    def load_checkpoints(self, gateway, raw_files):
+        """ Loads the rows classified by a prior, interrupted run.
 
-        # Summarize analysis
-        self.summarize_analysis(df)
-        self.update_space()
+            gateway - object storage gateway
+            raw_files - list of raw files currently in the space
+
+            Returns: (data frame of completed rows, set of completed (file, row) tuples)
+        """
+        df = pd.DataFrame([], columns=self.ANALYSIS_COLUMNS)
+        completed = set()
+        if not self.resume:
+            self.delete_checkpoints(gateway)
+            return df, completed
+
+        # load each shard
+        shards = []
+        for checkpoint in self.list_checkpoints(gateway):
+            logger.info("Loading checkpoint: %s", checkpoint)
+            contents = gateway.download(checkpoint)
+            shards.append(self.fill_text_columns(read_analysis_csv(contents)))
+        if len(shards) == 0:
+            return df, completed
+        df = pd.concat(shards, ignore_index=True)
+
+        # discard rows for raw files that have since been removed or replaced
+        current_fingerprints = df["Incident_File"].map(self.raw_file_fingerprints)
+        if self.CHECKPOINT_FINGERPRINT_COLUMN in df.columns:
+            shard_fingerprints = df[self.CHECKPOINT_FINGERPRINT_COLUMN].astype(str)
+            df = df[df["Incident_File"].isin(raw_files) & (shard_fingerprints == current_fingerprints)]
+        else:
+            logger.warning("Discarding checkpoint rows saved without raw file fingerprints.")
+            df = df.iloc[0:0]
+        df = df.drop(columns=[self.CHECKPOINT_FINGERPRINT_COLUMN], errors="ignore")
+        df = df.drop_duplicates(subset=["Incident_File", "Row"], keep="last")
+        df = self.drop_duplicate_incidents(df)
+
+        completed = set(zip(df["Incident_File"], df["Row"]))
+        logger.warning("Resuming analysis from checkpoint.  Completed Rows=%s", len(completed))
+        return df, completed
+
+    def fill_text_columns(self, df : pd.DataFrame) -> pd.DataFrame:
+        """ Replaces missing values in the text columns with empty strings, as empty
+            values read back from CSV or parquet are NaN rather than strings.
+
+            df - analysis data frame
+        """
+        for column in self.TEXT_COLUMNS:
+            if column in df.columns:
+                df[column] = df[column].astype(object).fillna("")
+        return df
 
-        # save analysis as a CSV
-        analysis_csv = df.to_csv(index=False)
-        gateway.upload(f"{self.space_id}/analysis.csv", analysis_csv)
+    def load_prior_analysis(self, raw_files):
+        """ Loads the results of the prior analysis that are still valid and determines
+            which raw files are new or modified since then.
+
+            raw_files - list of raw files currently in the space
+
+            Returns: (list of files to process, data frame of prior rows to keep)
+        """
+        # determine which files changed since the last analysis
+        metadata = load_metadata(self.space_id)
+        unchanged_files = []
+        changed_files = []
+        for file in raw_files:
+            if metadata.analyzed_files.get(file) == self.raw_file_fingerprints[file]:
+                unchanged_files.append(file)
+            else:
+                changed_files.append(file)
+
+        # load prior analysis, if exists
+        prior_df = None
+        if len(unchanged_files) > 0:
+            prior_df = load_analysis(self.space_id)
+        if prior_df is None:
+            logger.info("No reusable prior analysis.  Processing all raw files.")
+            return raw_files, None
+        self.prior_row_count = len(prior_df)
+
+        # drop rows for modified and deleted files along with the derived category
+        prior_df = prior_df[prior_df["Incident_File"].isin(unchanged_files)]
+        prior_df = prior_df.drop(columns=[self.COLUMN_AI_CATEGORY], errors="ignore")
+        prior_df = self.fill_text_columns(prior_df)
+        prior_df = self.drop_duplicate_incidents(prior_df)
+
+        # reprocess unchanged files holding copies no longer superseded, e.g. after the
+        # file with the newer copy was deleted
+        analyzed_rows = set(zip(prior_df["Incident_File"], prior_df["Row"]))
+        revived_rows = indexed_rows(self.dedup_indexes, unchanged_files) - self.duplicates - analyzed_rows
+        revived_files = sorted({file for file, _ in revived_rows})
+        if len(revived_files) > 0:
+            logger.info("Reprocessing files with incidents no longer superseded.  Files=%s",
+                        revived_files)
+            changed_files = [file for file in raw_files
+                             if file in changed_files or file in revived_files]
+
+        logger.info("Incremental analysis.  Unchanged Files=%s Changed Files=%s Prior Rows Kept=%s",
+                    len(unchanged_files), len(changed_files), len(prior_df))
+
+        return changed_files, prior_df
+
+    def drop_duplicate_incidents(self, df : pd.DataFrame) -> pd.DataFrame:
+        """ Drops rows holding superseded copies of an incident.
+
+            df - analysis data frame
+        """
+        if len(self.duplicates) > 0 and len(df) > 0:
+            keep = [row not in self.duplicates for row in zip(df["Incident_File"], df["Row"])]
+            df = df[keep]
+        return df.reset_index(drop=True)
+
+    def next_checkpoint_shard(self, gateway) -> int:
+        """ Gets the index to use for the next checkpoint shard.
+
+            gateway - object storage gateway
+        """
+        checkpoints = self.list_checkpoints(gateway)
+        if len(checkpoints) == 0:
+            return 0
+        last_shard = Path(checkpoints[-1]).stem.removeprefix(self.CHECKPOINT_PREFIX)
+        return int(last_shard) + 1
+
+    def save_checkpoint(self, gateway, shard : int, rows : list):
+        """ Saves a shard of completed rows to the space.
+
+            gateway - object storage gateway
+            shard - shard index
+            rows - list of completed rows
+        """
+        shard_df = pd.DataFrame(rows, columns=self.ANALYSIS_COLUMNS)
+
+        # record the version of each raw file the rows were classified from
+        shard_df[self.CHECKPOINT_FINGERPRINT_COLUMN] = \
+            shard_df["Incident_File"].map(self.raw_file_fingerprints)
+        path = f"{self.space_id}/{self.CHECKPOINT_DIR}/{self.CHECKPOINT_PREFIX}{shard:06d}.csv"
+        logger.info("Saving checkpoint.  Path=%s Rows=%s", path, len(rows))
+        gateway.upload(path, shard_df.to_csv(index=False))
+
+    def delete_checkpoints(self, gateway):
+        """ Deletes all checkpoint shards for the space.
+
+            gateway - object storage gateway
+        """
+        for checkpoint in self.list_checkpoints(gateway):
+            gateway.delete(checkpoint)
 
 
     def generalize_subcategories(self, df):
@@ -285,6 +555,7 @@ class FromSpaceCommand(BaseModel):
         self.metadata.last_analysis_date = datetime.now()
         self.metadata.summary_prompt = self.summary_prompt
         self.metadata.summary = self.summary
+        self.metadata.analyzed_files = self.raw_file_fingerprints
 
         # create the evaluation space
         save_metadata(self.metadata)
@@ -6,6 +6,7 @@ from pydantic import BaseModel
 from gateways.inference_gateway import InferenceGateway
 from utils.get_prompt import prompts
 from utils.settings import settings
+from utils.llm_cache import llm_cache
 
 logger = logging.getLogger(__name__)
 
@@ -32,6 +33,20 @@ class FromStringCommand(BaseModel):
     def go(self):
         """ Execute the command. """
 
+        # setup inferencing gateway
+        gateway = InferenceGateway()
+
+        # step 1 - Summarize input
+        self.summarize(gateway)
+
+        # step 2 - Analyze summary
+        self.analyze(gateway)
+
+    def summarize(self, gateway : InferenceGateway):
+        """ Step 1 - Summarizes the input string.
+
+            gateway - inference gateway
+        """
         # validate input file
         logger.debug("Input String: %s", self.input_str)
         if self.input_str is None or len(self.input_str) == 0:
@@ -39,18 +54,53 @@ class FromStringCommand(BaseModel):
             logger.error(msg)
             raise ValueError(msg)
 
-        # setup inferencing gateway
-        gateway = InferenceGateway()
-
-        # step 1 - Summarize input
-        step_1_response = gateway.simple_chat(settings.OPENAI_MODEL, prompts.STEP_1_SUMMARIZE, self.input_str)
+        step_1_key = llm_cache.make_key(settings.OPENAI_MODEL, prompts.STEP_1_SUMMARIZE, self.input_str)
+        step_1_response = llm_cache.get(step_1_key)
+        if step_1_response is None:
+            step_1_response = gateway.simple_chat(settings.OPENAI_MODEL, prompts.STEP_1_SUMMARIZE, self.input_str)
+            llm_cache.put(step_1_key, step_1_response)
         logger.info("Step #1 Response == %s", step_1_response)
         self.summary = step_1_response
 
-        # step 2 - Analyze summary
-        step_2_response = gateway.json_chat(settings.OPENAI_MODEL, prompts.STEP_2_ANALYZE, step_1_response)
+    def analyze(self, gateway : InferenceGateway):
+        """ Step 2 - Analyzes the summary created in step 1.
+
+            gateway - inference gateway
+        """
+        step_2_response = self.get_cached_analysis()
+        if step_2_response is None:
+            step_2_response = gateway.json_chat(settings.OPENAI_MODEL, prompts.STEP_2_ANALYZE, self.summary)
+            self.cache_analysis(step_2_response)
         logger.info("Step #2 Response == %s", step_2_response)
-        analysis = step_2_response
+        self.apply_analysis(step_2_response)
+
+    def get_cached_analysis(self, system_prompt : str = None) -> dict:
+        """ Gets the cached step 2 analysis for the summary or None if not cached.
+
+            system_prompt - system prompt the analysis was produced with (defaults to step 2)
+        """
+        system_prompt = system_prompt or prompts.STEP_2_ANALYZE
+        step_2_key = llm_cache.make_key(settings.OPENAI_MODEL, system_prompt, self.summary)
+        step_2_cached = llm_cache.get(step_2_key)
+        if step_2_cached is None:
+            return None
+        return json.loads(step_2_cached)
+
+    def cache_analysis(self, analysis : dict, system_prompt : str = None):
+        """ Caches the step 2 analysis for the summary.
+
+            analysis - step 2 analysis
+            system_prompt - system prompt the analysis was produced with (defaults to step 2)
+        """
+        system_prompt = system_prompt or prompts.STEP_2_ANALYZE
+        step_2_key = llm_cache.make_key(settings.OPENAI_MODEL, system_prompt, self.summary)
+        llm_cache.put(step_2_key, json.dumps(analysis))
+
+    def apply_analysis(self, analysis : dict):
+        """ Populates the output responses from the step 2 analysis.
+
+            analysis - step 2 analysis
+        """
         self.asset_name = analysis["asset_name"]
         self.category = analysis["category"]
         self.is_manual = analysis["is_manual"]
@@ -0,0 +1,131 @@
+""" Command for Analyzing a batch of Incidents via raw text. """
+import logging
+import json
+from pydantic import BaseModel
+from commands.from_string import FromStringCommand
+from gateways.inference_gateway import InferenceGateway
+from utils.get_prompt import prompts
+from utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class FromStringBatchCommand(BaseModel):
+    """ Command processor that analyzes several incidents with a single step 2 request.
+        Incidents missing from or malformed in the batched response fall back to
+        individual step 2 requests.
+    """
+
+    # constants
+    FIELD_ID : str = "id"
+    FIELD_SUMMARY : str = "summary"
+    REQUIRED_FIELDS : list[str] = ["asset_name", "category", "is_manual", "is_outage", "status"]
+    BASE_OUTPUT_TOKENS : int = 1024
+    OUTPUT_TOKENS_PER_INCIDENT : int = 256
+
+    # input parameters
+    input_strs : list[str] = None
+
+    # output responses
+    results : list[FromStringCommand] = []
+
+    def go(self):
+        """ Execute the command. """
+
+        # validate input strings
+        if self.input_strs is None or len(self.input_strs) == 0:
+            msg = "Input Strings is a Required Value and Cannot be Empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # setup inferencing gateway
+        gateway = InferenceGateway()
+
+        # step 1 - Summarize each input
+        commands = []
+        for input_str in self.input_strs:
+            command = FromStringCommand()
+            command.input_str = input_str
+            command.summarize(gateway)
+            commands.append(command)
+
+        # step 2 - Reuse cached analysis where possible, preferring single incident responses
+        pending = []
+        for command in commands:
+            analysis = command.get_cached_analysis()
+            if analysis is None:
+                analysis = command.get_cached_analysis(self.batch_system_prompt())
+            if analysis is None:
+                pending.append(command)
+            else:
+                command.apply_analysis(analysis)
+
+        # step 2 - Analyze remaining summaries in a single request
+        analyses = {}
+        if len(pending) > 1:
+            analyses = self.analyze_batch(gateway, pending)
+
+        # apply results, falling back to single incident requests
+        for index, command in enumerate(pending):
+            analysis = analyses.get(index)
+            if analysis is None:
+                if len(pending) > 1:
+                    logger.warning("Batch response missing or invalid for incident.  Falling back to single request.  Index=%s", index)   # pylint: disable=line-too-long
+                command.analyze(gateway)
+            else:
+                command.cache_analysis(analysis, self.batch_system_prompt())
+                command.apply_analysis(analysis)
+
+        self.results = commands
+
+    def batch_system_prompt(self) -> str:
+        """ Returns the system prompt sent with batched step 2 requests. """
+        return prompts.STEP_2_ANALYZE + "\n\n" + prompts.STEP_2_ANALYZE_BATCH
+
+    def analyze_batch(self, gateway : InferenceGateway, commands : list[FromStringCommand]) -> dict:
+        """ Analyzes the summaries for several incidents in one request.
+
+            gateway - inference gateway
+            commands - summarized incidents
+
+            Returns: dictionary of batch index to valid analysis
+        """
+        # build batch request
+        batch = []
+        for index, command in enumerate(commands):
+            batch.append({self.FIELD_ID: index, self.FIELD_SUMMARY: command.summary})
+        system_prompt = self.batch_system_prompt()
+        max_output_tokens = self.BASE_OUTPUT_TOKENS + self.OUTPUT_TOKENS_PER_INCIDENT * len(batch)
+
+        # invoke llm
+        try:
+            response = gateway.json_chat(settings.OPENAI_MODEL,
+                                         system_prompt,
+                                         json.dumps(batch),
+                                         max_output_tokens=max_output_tokens)
+        except ValueError as e:
+            logger.warning("Batch analysis failed.  Falling back to single requests.  Error=%s", e)
+            return {}
+        logger.info("Step #2 Batch Response == %s", response)
+
+        # split response into per incident analysis
+        analyses = {}
+        if not isinstance(response, list):
+            logger.warning("Batch analysis response is not a list.  Response=%s", response)
+            return analyses
+        for analysis in response:
+            if not isinstance(analysis, dict):
+                logger.warning("Unexpected batch analysis item.  Item=%s", analysis)
+                continue
+            index = analysis.get(self.FIELD_ID)
+            if not isinstance(index, int) or index < 0 or index >= len(commands):
+                logger.warning("Batch analysis item has an invalid id.  Item=%s", analysis)
+                continue
+            missing_fields = [f for f in self.REQUIRED_FIELDS if f not in analysis]
+            if len(missing_fields) > 0:
+                logger.warning("Batch analysis item is missing fields.  Missing=%s Item=%s",
+                               missing_fields, analysis)
+                continue
+            del analysis[self.FIELD_ID]
+            analyses[index] = analysis
+
+        return analyses
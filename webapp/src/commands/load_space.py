@@ -4,10 +4,12 @@ import os
 from pathlib import Path
 from pydantic import BaseModel, ConfigDict
 import pandas as pd
-from io import StringIO
 from metadata.evaluation_space import EvaluationSpaceMetadata
 from metadata.data_file import DataFile
 from gateways.object_storage_gateway import ObjectStorageGateway
+from utils.space_analysis import load_analysis, ANALYSIS_PARQUET_FILENAME, ANALYSIS_CSV_FILENAME
+from utils.heat_map_rollups import read_heat_map_rollups, HEAT_MAP_ROLLUPS_FILENAME
+from utils.space_state_cache import space_state_cache
 
 logger = logging.getLogger(__name__)
 
@@ -18,11 +20,13 @@ class LoadSpacesCommand(BaseModel):
 
     # input parameters
     space_id : str = None
+    columns : list[str] = None
 
     # output responses
     metadata : EvaluationSpaceMetadata = None
     analysis_filename : str = None
     analysis_df : pd.DataFrame = None
+    heat_map_rollups : pd.DataFrame = None
     raw_data_files : list[DataFile] = []
 
     def go(self):
@@ -34,24 +38,50 @@ class LoadSpacesCommand(BaseModel):
             logger.error(msg)
             raise ValueError(msg)
 
-        # get space metadata from object storage
+        # serve recently validated spaces without any I/O
+        variant = tuple(self.columns) if self.columns is not None else None
+        state = space_state_cache.get_fresh(self.space_id, variant)
+        if state is not None:
+            self.apply_state(state)
+            return
+
+        # reuse the cached space if none of its files have changed
         gateway = ObjectStorageGateway()
+        all_objects = gateway.list_objects(f"{self.space_id}/")
+        etags = {obj.key: obj.etag for obj in all_objects}
+        state = space_state_cache.revalidate(self.space_id, etags, variant)
+        if state is not None:
+            logger.debug("Space unchanged, using cached copy.  Space=%s", self.space_id)
+            self.apply_state(state)
+            return
+
+        # get space metadata from object storage
         path = f"{self.space_id}/metadata.json"
         metadata_str = gateway.download(path) 
         self.metadata = EvaluationSpaceMetadata.model_validate_json(metadata_str)
 
         # populate file lists associated with space
-        all_files = gateway.list()
-        for file in all_files:
+        self.raw_data_files = []
+        analysis_files = []
+        rollups_filename = None
+        for obj in all_objects:
             # break the file into parts
+            file = obj.key
             path_object = Path(file)
             parts = path_object.parts
 
             # find space
             if parts is not None and len(parts) > 0 and parts[0] == self.space_id:
                 if len(parts) == 2:
-                    if parts[1].lower() == "analysis.csv":
+                    if parts[1].lower() == ANALYSIS_PARQUET_FILENAME:
+                        analysis_files.append(file)
                         self.analysis_filename = file
+                    if parts[1].lower() == ANALYSIS_CSV_FILENAME:
+                        analysis_files.append(file)
+                        if self.analysis_filename is None:
+                            self.analysis_filename = file
+                    if parts[1].lower() == HEAT_MAP_ROLLUPS_FILENAME:
+                        rollups_filename = file
 
                 if len(parts) >= 3:
 
@@ -63,10 +93,32 @@ class LoadSpacesCommand(BaseModel):
                         data_file.parts = parts
                         self.raw_data_files.append(data_file)
 
-        # load analysis, if exists
-        if self.analysis_filename is not None and len(self.analysis_filename) > 0:
-            analysis_csv = gateway.download(self.analysis_filename)
-            analysis_csv_s = StringIO(analysis_csv)
-            self.analysis_df = pd.read_csv(analysis_csv_s)
+        # load analysis, preferring the parquet copy, if exists
+        if len(analysis_files) > 0:
+            self.analysis_df = load_analysis(self.space_id, self.columns, analysis_files)
             logger.info("Resulting Analysis Data Frame Shape: %s", self.analysis_df.shape)
             logger.info("Analysis Data Frame Head: %s", self.analysis_df.head())
+
+        # load heat map rollups, if exists
+        if rollups_filename is not None:
+            self.heat_map_rollups = read_heat_map_rollups(gateway.download_bytes(rollups_filename))
+
+        # share the loaded space with later reruns and sessions
+        state = self.model_copy()
+        space_state_cache.put(self.space_id, etags, state, variant)
+        self.apply_state(state)
+
+    def apply_state(self, state : "LoadSpacesCommand"):
+        """ Populates the outputs from a cached copy of the space.
+
+            state - previously loaded space
+        """
+        self.metadata = state.metadata
+        self.analysis_filename = state.analysis_filename
+        self.heat_map_rollups = state.heat_map_rollups
+        self.raw_data_files = list(state.raw_data_files)
+
+        # widgets modify the frame, so hand out a copy rather than the shared instance
+        self.analysis_df = None
+        if state.analysis_df is not None:
+            self.analysis_df = state.analysis_df.copy(deep=False)
@@ -5,6 +5,7 @@ import re
 import streamlit as st
 from openai import OpenAI
 from utils.settings import settings
+from utils.rate_limiter import get_rate_limiter, RateLimiter
 
 logger = logging.getLogger(__name__)
 
@@ -17,10 +18,15 @@ class InferenceGateway():
     # openai client
     openai_client : OpenAI = None
 
+    # rate limiter shared by all gateways using the same endpoint
+    rate_limiter : RateLimiter = None
+
     def __init__(self):
         """ Default Constructor """
         self.openai_client = OpenAI(base_url=settings.OPENAI_BASE_URL,
                                     api_key=settings.OPENAI_API_KEY)
+        self.rate_limiter = get_rate_limiter(settings.OPENAI_BASE_URL,
+                                             settings.OPENAI_MAX_REQUESTS_PER_SECOND)
 
     def simple_chat(self, model, system_prompt, user_prompt, mcp_list: list[dict] = []):
         """ Executes a simple chat based on the provided prompts.
@@ -42,6 +48,7 @@ class InferenceGateway():
             system_prompt = None
 
         # Employ OpenAI Responses AI
+        self.rate_limiter.acquire()
         response = self.openai_client.responses.create(
             model=model,
             instructions=system_prompt,
@@ -72,6 +79,7 @@ class InferenceGateway():
         logger.info("MCP Server List: %s", mcp_list)
 
         # Employ OpenAI Responses AI
+        self.rate_limiter.acquire()
         response_stream = self.openai_client.responses.create(
             model=model,
             instructions=system_prompt,
@@ -99,13 +107,14 @@ class InferenceGateway():
 
         return ai_response
 
-    def json_chat(self, model, system_prompt, user_prompt, tools = []):
+    def json_chat(self, model, system_prompt, user_prompt, tools = [], max_output_tokens=2048):
         """ Executes a simple chat based on the provided prompts that responds in JSON
 
             model - model to use
             system_prompt - system prompt
             user_prompt - user prompt
             tools - tools to use
+            max_output_tokens - maximum number of tokens in the response
         """
         # validate required fields
         if user_prompt is None or len(user_prompt) == 0:
@@ -121,13 +130,14 @@ class InferenceGateway():
         retry_count = 0
         while retry_count < self.MAX_RETRIES:
             # Employ OpenAI Responses AI
+            self.rate_limiter.acquire()
             response = self.openai_client.responses.create(
                 model=model,
                 instructions=system_prompt,
                 input=user_prompt,
                 tools=tools,
                 temperature=0.3,
-                max_output_tokens=2048,
+                max_output_tokens=max_output_tokens,
                 top_p=1,
                 store=False,
                 parallel_tool_calls=True,
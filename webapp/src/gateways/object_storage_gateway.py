@@ -1,34 +1,141 @@
 """ Service Gateway for accessing S3/Object Storage. """
 import logging
-from pathlib import Path
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import boto3
+from botocore.config import Config
+from botocore.exceptions import ClientError
 from utils.settings import settings
+from metadata.storage_object import StorageObject
 
 logger = logging.getLogger(__name__)
 
+# process wide s3 clients, keyed on connection info
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
+def get_s3_client():
+    """ Gets the process wide S3 client for the configured object storage.  Clients are
+        thread safe, so sharing one keeps its connection pool and TLS sessions warm
+        across commands and Streamlit reruns.
+    """
+    client_key = (settings.OBJECT_STORAGE_URL,
+                  settings.OBJECT_STORAGE_ACCESS_KEY,
+                  settings.OBJECT_STORAGE_SECRET_KEY)
+    with _s3_clients_lock:
+        s3_client = _s3_clients.get(client_key)
+        if s3_client is None:
+            logger.info("Creating S3 client.  Endpoint=%s", settings.OBJECT_STORAGE_URL)
+            session = boto3.session.Session()
+            s3_client = session.client(
+                "s3",
+                aws_access_key_id = settings.OBJECT_STORAGE_ACCESS_KEY,
+                aws_secret_access_key = settings.OBJECT_STORAGE_SECRET_KEY,
+                endpoint_url = settings.OBJECT_STORAGE_URL,
+                #verify = False,
+                config = Config(
+                    signature_version='s3v4',   # For MinIO compatibility
+                    max_pool_connections=settings.OBJECT_STORAGE_MAX_POOL_CONNECTIONS,
+                    tcp_keepalive=True,
+                    connect_timeout=settings.API_TIMEOUT,
+                    read_timeout=settings.API_TIMEOUT,
+                    retries={
+                        "max_attempts": settings.OBJECT_STORAGE_MAX_ATTEMPTS,
+                        "mode": "standard",
+                    },
+                )
+            )
+            _s3_clients[client_key] = s3_client
+        return s3_client
+
+# callbacks notified with the key of every file written or deleted by this process
+_write_listeners = []
+
+def add_write_listener(fn_listener):
+    """ Registers a callback invoked with the key of each file that is uploaded or
+        deleted, allowing caches to invalidate their copies.
+
+        fn_listener - callback accepting the modified key
+    """
+    _write_listeners.append(fn_listener)
+
+def notify_write(key : str):
+    """ Notifies registered listeners that a file was modified.
+
+        key - name of modified file
+    """
+    for fn_listener in _write_listeners:
+        fn_listener(key)
+
 class ObjectStorageGateway():
     """ Service Gateway for Object Storage """
 
+    # constants
+    STREAM_CHUNK_SIZE : int = 1024 * 1024
+    MULTIPART_PART_SIZE : int = 8 * 1024 * 1024
+    MAX_DELETE_BATCH_SIZE : int = 1000
+    MAX_DELETE_CONCURRENCY : int = 8
+    CONDITIONAL_WRITE_CONFLICTS : tuple = ("PreconditionFailed", "ConditionalRequestConflict", "412", "409")
+
     # object storage client info
     s3_client = None
     bucket_name : str = None
 
     def __init__(self):
         """ Default Constructor """
-        self.s3_client = boto3.client(
-            "s3",
-            aws_access_key_id = settings.OBJECT_STORAGE_ACCESS_KEY,
-            aws_secret_access_key = settings.OBJECT_STORAGE_SECRET_KEY,
-            endpoint_url = settings.OBJECT_STORAGE_URL,
-            #verify = False,
-            config = boto3.session.Config(signature_version='s3v4')   # For MinIO compatibility
-        )
+        self.s3_client = get_s3_client()
         self.bucket_name = settings.OBJECT_STORAGE_BUCKET
 
-    def list(self):
+    def list(self, prefix : str = None):
         """ List the files in a bucket.
         
-            bucket_name - bucket name
+            prefix - only list files whose key starts with the prefix
+        """
+        object_list = []
+        for obj in self.list_objects(prefix):
+            object_list.append(obj.key)
+
+        logger.debug("List of Objects in folder: %s", object_list)
+        return object_list
+
+    def list_objects(self, prefix : str = None, delimiter : str = None):
+        """ List the files in a bucket along with their size, etag and modification date.
+
+            prefix - only list files whose key starts with the prefix
+            delimiter - do not list files nested beneath the delimiter after the prefix
+        """
+        object_list = []
+        for page in self.iter_list_pages(prefix, delimiter):
+            for obj in page.get("Contents", []):
+                storage_object = StorageObject()
+                storage_object.key = obj["Key"]
+                storage_object.size = obj["Size"]
+                storage_object.etag = obj["ETag"].strip('"')
+                storage_object.last_modified = obj["LastModified"]
+                object_list.append(storage_object)
+
+        return object_list
+
+    def list_prefixes(self, prefix : str = None, delimiter : str = "/"):
+        """ List the "directories" directly beneath the prefix.
+
+            prefix - parent prefix (None for the root of the bucket)
+            delimiter - directory delimiter
+        """
+        prefix_list = []
+        for page in self.iter_list_pages(prefix, delimiter):
+            for common_prefix in page.get("CommonPrefixes", []):
+                prefix_list.append(common_prefix["Prefix"])
+
+        logger.debug("List of Prefixes in folder: %s", prefix_list)
+        return prefix_list
+
+    def iter_list_pages(self, prefix : str = None, delimiter : str = None):
+        """ Generates each page of results from the list objects api, following
+            continuation tokens until the listing is complete.
+
+            prefix - only list files whose key starts with the prefix
+            delimiter - group keys nested beneath the delimiter into common prefixes
         """
         # validate bucket name
         if self.bucket_name is None or len(self.bucket_name) == 0:
@@ -36,20 +143,20 @@ class ObjectStorageGateway():
             logger.error(msg)
             raise ValueError(msg)
 
-        # invoke list objects api
-        response = self.s3_client.list_objects_v2(Bucket=self.bucket_name)
-
-        object_list = []
-
-        # save object list to a clean array
-        if "Contents" in response:
-            for obj in response["Contents"]:
-                object_list.append(obj['Key'])
+        # build request
+        parameters = {"Bucket": self.bucket_name}
+        if prefix is not None and len(prefix) > 0:
+            parameters["Prefix"] = prefix
+        if delimiter is not None and len(delimiter) > 0:
+            parameters["Delimiter"] = delimiter
 
-        logger.debug("List of Objects in folder: %s", object_list)
-        return object_list
+        # invoke list objects api
+        logger.debug("Listing objects.  Prefix=%s Delimiter=%s", prefix, delimiter)
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(**parameters):
+            yield page
 
-    def upload(self, key : str, contents : str):
+    def upload(self, key : str, contents : str | bytes):
         """ Upload a new file to the bucket. """
         # validate input parameters
         if key is None or len(key) == 0:
@@ -64,6 +171,135 @@ class ObjectStorageGateway():
         self.s3_client.put_object(Bucket=self.bucket_name,
                                   Key=key,
                                   Body=contents)
+        notify_write(key)
+
+    def upload_if_match(self, key : str, contents : str | bytes, etag : str = None) -> bool:
+        """ Uploads a file only if it has not changed since it was read.
+
+            key - name of file
+            contents - file contents
+            etag - etag of the file when it was read (None to only create a new file)
+
+            Returns: True if uploaded, False if the file was changed by another writer
+        """
+        # validate input parameters
+        if key is None or len(key) == 0:
+            msg = "Key is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+        if contents is None or len(contents) == 0:
+            contents = ""
+
+        # conditionally upload the data
+        parameters = {"Bucket": self.bucket_name, "Key": key, "Body": contents}
+        if etag is not None and len(etag) > 0:
+            parameters["IfMatch"] = f'"{etag}"'
+        else:
+            parameters["IfNoneMatch"] = "*"
+        logger.info("Conditionally uploading contents to bucket.  Key=%s ETag=%s", key, etag)
+        try:
+            self.s3_client.put_object(**parameters)
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in self.CONDITIONAL_WRITE_CONFLICTS:
+                logger.info("File changed by another writer.  Key=%s ETag=%s", key, etag)
+                return False
+            raise
+        notify_write(key)
+        return True
+
+    def upload_stream(self, key : str, chunks) -> int:
+        """ Uploads a file from a stream of chunks without holding the whole file in
+            memory.  Chunks are buffered into parts of at least MULTIPART_PART_SIZE and sent
+            as a multipart upload, which is aborted if the stream or an upload fails.  Files
+            smaller than one part are sent with a single request.
+
+            key - name of file
+            chunks - iterable of str or bytes chunks
+
+            Returns: number of bytes uploaded
+        """
+        # validate input parameters
+        if key is None or len(key) == 0:
+            msg = "Key is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        logger.info("Streaming upload to bucket.  Key=%s", key)
+        buffer = []
+        buffered = 0
+        total = 0
+        upload_id = None
+        parts = []
+        try:
+            for chunk in chunks:
+                if isinstance(chunk, str):
+                    chunk = chunk.encode('utf-8')
+                buffer.append(chunk)
+                buffered += len(chunk)
+                total += len(chunk)
+
+                # send a part once enough data is buffered
+                if buffered >= self.MULTIPART_PART_SIZE:
+                    if upload_id is None:
+                        response = self.s3_client.create_multipart_upload(Bucket=self.bucket_name,
+                                                                          Key=key)
+                        upload_id = response["UploadId"]
+                    parts.append(self.upload_part(key, upload_id, len(parts) + 1, b"".join(buffer)))
+                    buffer = []
+                    buffered = 0
+
+            # small files do not need a multipart upload
+            if upload_id is None:
+                self.upload(key, b"".join(buffer))
+                return total
+
+            # send the final part and assemble the file
+            if buffered > 0:
+                parts.append(self.upload_part(key, upload_id, len(parts) + 1, b"".join(buffer)))
+            self.s3_client.complete_multipart_upload(Bucket=self.bucket_name,
+                                                     Key=key,
+                                                     UploadId=upload_id,
+                                                     MultipartUpload={"Parts": parts})
+        except Exception:
+            if upload_id is not None:
+                logger.error("Streaming upload failed.  Aborting.  Key=%s Parts=%s", key, len(parts))
+                self.s3_client.abort_multipart_upload(Bucket=self.bucket_name,
+                                                      Key=key,
+                                                      UploadId=upload_id)
+            raise
+
+        logger.info("Streaming upload complete.  Key=%s Parts=%s Bytes=%s", key, len(parts), total)
+        notify_write(key)
+        return total
+
+    def upload_part(self, key : str, upload_id : str, part_number : int, contents : bytes) -> dict:
+        """ Uploads one part of a multipart upload.
+
+            key - name of file
+            upload_id - multipart upload id
+            part_number - part number, starting at 1
+            contents - part contents
+
+            Returns: part descriptor for completing the upload
+        """
+        logger.debug("Uploading part.  Key=%s Part=%s Bytes=%s", key, part_number, len(contents))
+        response = self.s3_client.upload_part(Bucket=self.bucket_name,
+                                              Key=key,
+                                              UploadId=upload_id,
+                                              PartNumber=part_number,
+                                              Body=contents)
+        return {"ETag": response["ETag"], "PartNumber": part_number}
+
+    def download_if_exists(self, key : str) -> str:
+        """ Downloads a file from the bucket, returning None if it does not exist.
+
+            key - name of file
+        """
+        try:
+            return self.download(key)
+        except self.s3_client.exceptions.NoSuchKey:
+            logger.debug("File does not exist.  Key=%s", key)
+            return None
 
     def download(self, key : str) -> str:
         """ Downloads a file from the bucket.
@@ -76,13 +312,83 @@ class ObjectStorageGateway():
             logger.error(msg)
             raise ValueError(msg)
 
+        # download the file
+        contents = self.download_bytes(key).decode('utf-8')
+
+        logger.debug("File contents.  Key=%s Contents=%s", key, contents)
+        return contents
+
+    def download_bytes(self, key : str) -> bytes:
+        """ Downloads a binary file from the bucket.
+
+            key - name of file
+        """
+        # validate input parameters
+        if key is None or len(key) == 0:
+            msg = "Key is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
         # download the file
         logger.info("Downloading file from bucket.  Key=%s", key)
         response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        return response['Body'].read()
+
+    def download_if_modified(self, key : str, etag : str = None):
+        """ Downloads a file from the bucket unless its etag still matches.
+
+            key - name of file
+            etag - etag of the copy already held by the caller (None to always download)
+
+            Returns: (contents, etag) where contents is None if the file is unchanged and
+                     both are None if the file does not exist
+        """
+        # validate input parameters
+        if key is None or len(key) == 0:
+            msg = "Key is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # conditionally download the file
+        parameters = {"Bucket": self.bucket_name, "Key": key}
+        if etag is not None and len(etag) > 0:
+            parameters["IfNoneMatch"] = f'"{etag}"'
+        try:
+            response = self.s3_client.get_object(**parameters)
+        except self.s3_client.exceptions.NoSuchKey:
+            logger.debug("File does not exist.  Key=%s", key)
+            return None, None
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") == "304":
+                logger.debug("File not modified.  Key=%s ETag=%s", key, etag)
+                return None, etag
+            raise
+
+        logger.info("Downloaded file from bucket.  Key=%s", key)
         contents = response['Body'].read().decode('utf-8')
+        return contents, response["ETag"].strip('"')
 
-        logger.debug("File contents.  Key=%s Contents=%s", key, contents)
-        return contents
+    def iter_lines(self, key : str):
+        """ Streams a text file from the bucket one line at a time, reading the object
+            in fixed size chunks so memory use does not grow with the file size.
+
+            key - name of file
+        """
+        # validate input parameters
+        if key is None or len(key) == 0:
+            msg = "Key is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # stream the file
+        logger.info("Streaming file from bucket.  Key=%s", key)
+        response = self.s3_client.get_object(Bucket=self.bucket_name, Key=key)
+        body = response['Body']
+        try:
+            for line in body.iter_lines(chunk_size=self.STREAM_CHUNK_SIZE):
+                yield line.decode('utf-8')
+        finally:
+            body.close()
 
     def delete(self, key : str):
         """ Deletes the specified file from the bucket.
@@ -98,11 +404,92 @@ class ObjectStorageGateway():
         # download the file
         logger.info("Deleting file from bucket.  Key=%s", key)
         self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
+        notify_write(key)
+
+    def delete_batch(self, keys):
+        """ Deletes up to MAX_DELETE_BATCH_SIZE files with a single request.
 
-    def delete_root_dir(self, root_dir : str):
+            keys - names of files to delete
+
+            Returns: list of keys that could not be deleted
+        """
+        # validate input parameters
+        if keys is None or len(keys) == 0:
+            return []
+        if len(keys) > self.MAX_DELETE_BATCH_SIZE:
+            msg = f"Too many keys in delete batch!  Count={len(keys)} Max={self.MAX_DELETE_BATCH_SIZE}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # delete the files
+        logger.info("Deleting batch of files from bucket.  Count=%s", len(keys))
+        objects = [{"Key": key} for key in keys]
+        response = self.s3_client.delete_objects(Bucket=self.bucket_name,
+                                                 Delete={"Objects": objects, "Quiet": True})
+        for key in keys:
+            notify_write(key)
+
+        # collect partial failures
+        failed_keys = []
+        for error in response.get("Errors", []):
+            logger.error("Unable to delete file.  Key=%s Code=%s Message=%s",
+                         error.get("Key"), error.get("Code"), error.get("Message"))
+            failed_keys.append(error.get("Key"))
+        return failed_keys
+
+    def delete_prefix(self, prefix : str, fn_progress = None):
+        """ Deletes all files whose key starts with the prefix using batched, parallel
+            multi-object delete requests.
+
+            prefix - key prefix
+            fn_progress - optional callback invoked with (files processed, total files)
+
+            Returns: list of keys that could not be deleted
+        """
+        # validate input parameters
+        if prefix is None or len(prefix) == 0:
+            msg = "Prefix is required but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        # list files and split into batches
+        keys = self.list(prefix)
+        batches = []
+        for i in range(0, len(keys), self.MAX_DELETE_BATCH_SIZE):
+            batches.append(keys[i:i + self.MAX_DELETE_BATCH_SIZE])
+        logger.warning("Deleting files.  Prefix=%s Count=%s Batches=%s",
+                       prefix, len(keys), len(batches))
+
+        # delete batches in parallel, reporting progress as each completes
+        processed = 0
+        failed_keys = []
+        with ThreadPoolExecutor(max_workers=self.MAX_DELETE_CONCURRENCY) as executor:
+            futures = {}
+            for batch in batches:
+                futures[executor.submit(self.delete_batch, batch)] = batch
+            for future in as_completed(futures):
+                batch = futures[future]
+                try:
+                    failed_keys.extend(future.result())
+                except ClientError as e:
+                    logger.error("Delete batch failed.  Count=%s Error=%s", len(batch), e)
+                    failed_keys.extend(batch)
+                processed += len(batch)
+                if fn_progress is not None:
+                    fn_progress(processed, len(keys))
+
+        if len(failed_keys) > 0:
+            logger.error("Unable to delete all files.  Prefix=%s Failed=%s",
+                         prefix, len(failed_keys))
+        return failed_keys
+
+    def delete_root_dir(self, root_dir : str, fn_progress = None):
         """ Deletes all files in/under the root directory from the bucket.
         
             root_dir - root directory
+            fn_progress - optional callback invoked with (files processed, total files)
+
+            Returns: list of keys that could not be deleted
         """
         # validate input parameters
         if root_dir is None or len(root_dir) == 0:
@@ -110,15 +497,4 @@ class ObjectStorageGateway():
             logger.error(msg)
             raise ValueError(msg)
 
-        # list files
-        all_files = self.list()
-        for file in all_files:
-            # parse path
-            path_object = Path(file)
-            parts = path_object.parts
-
-            # check for match
-            if parts is not None and len(parts) > 1:
-                if parts[0] == root_dir:
-                    logger.warning("Deleting file: %s", file)
-                    self.delete(file)
+        return self.delete_prefix(root_dir + "/", fn_progress)
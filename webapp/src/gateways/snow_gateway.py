@@ -1,12 +1,42 @@
 """ Service Gateway for ServiceNow API Access. """
 import logging
+import threading
 from urllib.parse import urlencode
 import base64
+from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from utils.settings import settings
+from utils.bounded_executor import ordered_map
 
 logger = logging.getLogger(__name__)
 
+# process wide http session so connections to the instance are reused
+_snow_session = None
+_snow_session_lock = threading.Lock()
+
+def get_snow_session() -> requests.Session:
+    """ Gets the process wide HTTP session for ServiceNow.  Throttled (429) and failed
+        (5xx) requests are retried with exponential backoff, honoring Retry-After.
+    """
+    global _snow_session    # pylint: disable=global-statement
+    with _snow_session_lock:
+        if _snow_session is None:
+            retry = Retry(total=settings.SERVICE_NOW_MAX_RETRIES,
+                          backoff_factor=1,
+                          status_forcelist=[429, 500, 502, 503, 504],
+                          allowed_methods=["GET"],
+                          respect_retry_after_header=True,
+                          raise_on_status=False)
+            pool_size = max(10, settings.SERVICE_NOW_CONCURRENCY)
+            adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size,
+                                  max_retries=retry)
+            session = requests.Session()
+            session.mount("https://", adapter)
+            _snow_session = session
+        return _snow_session
+
 # pylint: disable=too-few-public-methods
 class ServiceNowGateway():
     """ Service Now Service Gateway """
@@ -20,7 +50,48 @@ class ServiceNowGateway():
     SNOW_LIMIT = "sysparm_limit"
     SNOW_OFFSET = "sysparm_offset"
     SNOW_DISPLAY_VALUE = "sysparm_display_value"
+    SNOW_EXCLUDE_REFERENCE_LINK = "sysparm_exclude_reference_link"
     SNOW_FILTER_CREATE_DATE = "sys_created_on"
+    SNOW_QUERY_AND = "^"
+    SNOW_QUERY_NEW_QUERY = "^NQ"
+    SNOW_FIELD_SYS_ID = "sys_id"
+    SNOW_ORDER_BY = "ORDERBY"
+    SNOW_DEFAULT_ORDER = "ORDERBYsys_id"
+    SNOW_DISPLAY_VALUE_ALL = "all"
+    SNOW_FIELD_DISPLAY_VALUE = "display_value"
+    SNOW_FIELD_VALUE = "value"
+    SNOW_DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+    HEADER_TOTAL_COUNT = "X-Total-Count"
+
+    # fields always kept as raw values, e.g. timestamps in UTC rather than the user's format
+    RAW_VALUE_FIELDS = ["sys_id", "sys_updated_on"]
+
+    # field profiles, None pulls every field as raw values
+    FIELD_PROFILE_CLASSIFICATION = "classification"
+    FIELD_PROFILE_FULL = "full"
+    FIELD_PROFILES = {
+        FIELD_PROFILE_CLASSIFICATION: ["sys_id",
+                                       "number",
+                                       "short_description",
+                                       "description",
+                                       "cmdb_ci",
+                                       "business_service",
+                                       "category",
+                                       "subcategory",
+                                       "priority",
+                                       "impact",
+                                       "urgency",
+                                       "state",
+                                       "assignment_group",
+                                       "opened_at",
+                                       "resolved_at",
+                                       "closed_at",
+                                       "close_code",
+                                       "close_notes",
+                                       "sys_created_on",
+                                       "sys_updated_on"],
+        FIELD_PROFILE_FULL: None,
+    }
 
     # Service Now Action List
     class ServiceNowActions():
@@ -44,11 +115,22 @@ class ServiceNowGateway():
         # sysparm_offset: Offset the starting record for pagination.
         # sysparm_display_value: Control how reference fields are displayed (e.g., true for display values, false for sys_ids).
 
+        json_response, _ = self.get_snow(self.ServiceNowActions.SNOW_INCIDENT_TABLE, parameters)
+        return json_response
+
+    def get_snow(self, action : str, parameters : dict):
+        """ Invokes the Service Now API over the pooled session.
+
+            action - service now action to perform
+            parameters - dictionary of key value pairs to include in request url
+
+            Returns: (json response, response headers)
+        """
         # invoke snow api
-        url = self.get_snow_url(self.ServiceNowActions.SNOW_INCIDENT_TABLE, parameters)
+        url = self.get_snow_url(action, parameters)
         logger.info("SNOW URL: %s", url)
         headers = self.build_snow_headers()
-        http_response = requests.get(url, headers=headers, timeout=settings.API_TIMEOUT)
+        http_response = get_snow_session().get(url, headers=headers, timeout=settings.API_TIMEOUT)
         if http_response.status_code != 200:
             msg = f"Unable to invoke SNOW API.  HTTP Response Code = {http_response.status_code}"
             logger.error(msg)
@@ -56,7 +138,177 @@ class ServiceNowGateway():
         json_response = http_response.json()
 
         logger.debug("JSON Resposne from ServiceNow Query = %s", json_response)
-        return json_response
+        return json_response, http_response.headers
+
+    def query_snow_page(self, parameters : dict, offset : int, limit : int):
+        """ Queries a single page of incidents.
+
+            parameters - search parameters
+            offset - index of the first incident in the page
+            limit - maximum number of incidents in the page
+
+            Returns: (list of incidents, total incident count or None if not reported)
+        """
+        page_parameters = dict(parameters)
+        page_parameters[self.SNOW_OFFSET] = str(offset)
+        page_parameters[self.SNOW_LIMIT] = str(limit)
+        json_response, headers = self.get_snow(self.ServiceNowActions.SNOW_INCIDENT_TABLE,
+                                               page_parameters)
+
+        total_count = headers.get(self.HEADER_TOTAL_COUNT)
+        if total_count is not None:
+            total_count = int(total_count)
+        rows = json_response.get("result", [])
+        if parameters.get(self.SNOW_DISPLAY_VALUE) == self.SNOW_DISPLAY_VALUE_ALL:
+            rows = [self.flatten_display_values(row) for row in rows]
+        return rows, total_count
+
+    def iter_keyset_pages(self, parameters : dict, order_field : str, row_limit : int = -1,
+                          fn_progress = None):
+        """ Queries incidents a page at a time in (order_field, sys_id) order, starting each
+            page after the last incident of the prior page rather than at an offset.  An
+            incident updated while paging moves past the current page and is read again
+            later instead of shifting the pages after it, so none are skipped.  Pages are
+            fetched one at a time since each depends on the last.
+
+            parameters - search parameters, with a query holding only filter conditions
+            order_field - field to page on (must be returned as a raw value)
+            row_limit - maximum number of incidents to return (-1 for no limit)
+            fn_progress - optional callback invoked with (incidents fetched, total incidents)
+        """
+        base_query = parameters.get(self.SNOW_QUERY, "")
+        order = self.SNOW_QUERY_AND.join([self.SNOW_ORDER_BY + order_field, self.SNOW_DEFAULT_ORDER])
+        page_size = settings.SERVICE_NOW_PAGE_SIZE
+        fetched = 0
+        total = None
+        last_row = None
+        while row_limit is None or row_limit <= 0 or fetched < row_limit:
+            limit = page_size
+            if row_limit is not None and row_limit > 0:
+                limit = min(page_size, row_limit - fetched)
+
+            # continue after the last incident: later values, or the same value with a later sys_id
+            if last_row is None:
+                query = self.SNOW_QUERY_AND.join(filter(None, [base_query, order]))
+            else:
+                value = last_row.get(order_field)
+                sys_id = last_row.get(self.SNOW_FIELD_SYS_ID)
+                if value is None or sys_id is None:
+                    msg = f"Unable to page Service Now results without {order_field} and {self.SNOW_FIELD_SYS_ID}!"
+                    logger.error(msg)
+                    raise ValueError(msg)
+                later_value = self.SNOW_QUERY_AND.join(filter(None, [base_query, f"{order_field}>{value}"]))
+                same_value = self.SNOW_QUERY_AND.join(filter(None, [base_query, f"{order_field}={value}",
+                                                                    f"{self.SNOW_FIELD_SYS_ID}>{sys_id}"]))
+                query = later_value + self.SNOW_QUERY_NEW_QUERY + same_value + self.SNOW_QUERY_AND + order
+            page_parameters = dict(parameters)
+            page_parameters[self.SNOW_QUERY] = query
+
+            rows, page_total = self.query_snow_page(page_parameters, 0, limit)
+            fetched += len(rows)
+            if total is None and page_total is not None:
+                total = page_total
+                if row_limit is not None and row_limit > 0:
+                    total = min(total, row_limit)
+            if fn_progress is not None:
+                fn_progress(fetched, max(total or 0, fetched))
+            if len(rows) > 0:
+                yield rows
+            if len(rows) < limit:
+                return
+            last_row = rows[-1]
+
+    def flatten_display_values(self, row : dict) -> dict:
+        """ Flattens an incident queried with both display and raw values, keeping the
+            display value of each field except the RAW_VALUE_FIELDS.
+
+            row - incident with a {display_value, value} pair for each field
+        """
+        flattened = {}
+        for field, value in row.items():
+            if isinstance(value, dict) and self.SNOW_FIELD_VALUE in value:
+                key = self.SNOW_FIELD_VALUE if field in self.RAW_VALUE_FIELDS else self.SNOW_FIELD_DISPLAY_VALUE
+                value = value.get(key, value[self.SNOW_FIELD_VALUE])
+            flattened[field] = value
+        return flattened
+
+    def iter_query_pages(self, parameters : dict, row_limit : int = -1, fn_progress = None):
+        """ Queries incidents a page at a time, yielding the pages in order.  The first
+            page reports the total count, after which the remaining pages are fetched
+            concurrently.
+
+            parameters - search parameters
+            row_limit - maximum number of incidents to return (-1 for no limit)
+            fn_progress - optional callback invoked with (incidents fetched, total incidents)
+        """
+        # offsets are only stable when the results have a fixed order
+        parameters = dict(parameters)
+        query = parameters.get(self.SNOW_QUERY, "")
+        if self.SNOW_ORDER_BY not in query:
+            query = self.SNOW_QUERY_AND.join(filter(None, [query, self.SNOW_DEFAULT_ORDER]))
+            parameters[self.SNOW_QUERY] = query
+
+        page_size = settings.SERVICE_NOW_PAGE_SIZE
+        if row_limit is not None and row_limit > 0:
+            page_size = min(page_size, row_limit)
+
+        # first page determines the total number of incidents
+        rows, total = self.query_snow_page(parameters, 0, page_size)
+        fetched = len(rows)
+        if total is not None and row_limit is not None and row_limit > 0:
+            total = min(total, row_limit)
+        if fn_progress is not None:
+            fn_progress(fetched, total if total is not None else fetched)
+        yield rows
+
+        # without a total, page sequentially until a short page is returned
+        if total is None:
+            logger.warning("SNOW did not report a total count.  Paging sequentially.")
+            while len(rows) == page_size and (row_limit is None or row_limit <= 0 or fetched < row_limit):
+                limit = page_size
+                if row_limit is not None and row_limit > 0:
+                    limit = min(page_size, row_limit - fetched)
+                rows, _ = self.query_snow_page(parameters, fetched, limit)
+                fetched += len(rows)
+                if fn_progress is not None:
+                    fn_progress(fetched, fetched)
+                if len(rows) > 0:
+                    yield rows
+            return
+
+        # fetch remaining pages concurrently
+        logger.info("SNOW query.  Total=%s Page Size=%s Concurrency=%s",
+                    total, page_size, settings.SERVICE_NOW_CONCURRENCY)
+        def fetch_page(offset):
+            page_rows, _ = self.query_snow_page(parameters, offset, min(page_size, total - offset))
+            return page_rows
+        offsets = range(page_size, total, page_size)
+        for rows in ordered_map(fetch_page, offsets, max(1, settings.SERVICE_NOW_CONCURRENCY)):
+            fetched += len(rows)
+            if fn_progress is not None:
+                fn_progress(fetched, total)
+            yield rows
+
+    def build_field_parameters(self, field_profile : str) -> dict:
+        """ Builds the parameters projecting a query onto the fields of a profile.  Profiles
+            with a field list also return display values in place of reference sys_ids,
+            except for the RAW_VALUE_FIELDS.
+
+            field_profile - name of field profile
+        """
+        # validate profile
+        if field_profile not in self.FIELD_PROFILES:
+            msg = f"Unknown Service Now field profile!  Profile={field_profile} Options={list(self.FIELD_PROFILES)}"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        parameters = {}
+        fields = self.FIELD_PROFILES[field_profile]
+        if fields is not None:
+            parameters[self.SNOW_FIELDS] = ",".join(fields)
+            parameters[self.SNOW_DISPLAY_VALUE] = self.SNOW_DISPLAY_VALUE_ALL
+            parameters[self.SNOW_EXCLUDE_REFERENCE_LINK] = "true"
+        return parameters
 
     def get_snow_url(self, action : str, parameters : dict) -> str:
         """ Builds the Service Now URL for the provided action. 
@@ -122,4 +374,23 @@ class ServiceNowGateway():
             logger.error(msg)
             raise ValueError(msg)
 
-        return date_obj.strftime("%Y-%m-%d") + " 00:00:00"
\ No newline at end of file
+        return date_obj.strftime("%Y-%m-%d") + " 00:00:00"
+
+    def datetime_to_string(self, datetime_obj : datetime) -> str:
+        """ Convert the provided UTC datetime to the raw service now datetime format.
+
+            datetime_obj - datetime object in UTC
+        """
+        return datetime_obj.strftime(self.SNOW_DATETIME_FORMAT)
+
+    def parse_datetime(self, value : str) -> datetime:
+        """ Parses a raw service now datetime (UTC), or None if it is not in the raw format.
+
+            value - datetime string
+        """
+        if not isinstance(value, str):
+            return None
+        try:
+            return datetime.strptime(value.strip(), self.SNOW_DATETIME_FORMAT)
+        except ValueError:
+            return None
\ No newline at end of file
@@ -0,0 +1,16 @@
+""" Incident De-duplication Index Type """
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class DedupIndex(BaseModel):
+    """ Data Type for the index of the incidents in a single raw file of a space """
+
+    # raw file name
+    file : str = None
+
+    # when the raw file was imported, later imports win ties between copies
+    imported : Optional[datetime] = None
+
+    # every incident in the file (list of [incident key, row, sys_updated_on])
+    entries : list[tuple[str, int, str]] = []
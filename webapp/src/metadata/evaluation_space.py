@@ -2,6 +2,7 @@
 from datetime import datetime
 from typing import Optional
 from pydantic import BaseModel
+from metadata.snow_sync_cursor import SnowSyncCursor
 
 class EvaluationSpaceMetadata(BaseModel):
     """ Data Type for the Evaluation Space Metadata File """
@@ -23,3 +24,9 @@ class EvaluationSpaceMetadata(BaseModel):
 
     # summary
     summary : Optional[str] = None
+
+    # fingerprints of the raw files included in the last analysis (path -> fingerprint)
+    analyzed_files : dict[str, str] = {}
+
+    # high-water mark for incremental ServiceNow syncs
+    snow_sync_cursor : Optional[SnowSyncCursor] = None
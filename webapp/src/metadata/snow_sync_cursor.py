@@ -0,0 +1,16 @@
+""" ServiceNow Sync Cursor Type """
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class SnowSyncCursor(BaseModel):
+    """ High-water mark of the incidents already pulled from ServiceNow into a space """
+
+    # latest sys_updated_on pulled, in UTC as yyyy-MM-dd HH:mm:ss
+    updated_on : str = ""
+
+    # sys_updated_on of each incident pulled within the lookback window of the mark (sys_id -> updated on)
+    recent_ids : dict[str, str] = {}
+
+    # when the space was last synced
+    last_sync_date : Optional[datetime] = None
@@ -0,0 +1,14 @@
+""" Space Index Type """
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+from metadata.evaluation_space import EvaluationSpaceMetadata
+
+class SpaceIndex(BaseModel):
+    """ Data Type for the index of all Evaluation Spaces in the bucket """
+
+    # date the index was last rebuilt from the individual metadata files
+    rebuilt : Optional[datetime] = None
+
+    # summary metadata for each evaluation space
+    spaces : list[EvaluationSpaceMetadata] = []
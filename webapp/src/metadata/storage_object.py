@@ -0,0 +1,16 @@
+""" Type for an object listed from object storage. """
+from datetime import datetime
+from typing import Optional
+from pydantic import BaseModel
+
+class StorageObject(BaseModel):
+    """ Listing details for an object in object storage. """
+
+    key : str = None
+    size : int = 0
+    etag : str = None
+    last_modified : Optional[datetime] = None
+
+    def fingerprint(self) -> str:
+        """ Gets a fingerprint for the object that changes whenever its contents change. """
+        return f"{self.etag}:{self.size}"
@@ -0,0 +1,121 @@
+""" Tests for incremental ServiceNow syncs. """
+import unittest
+from unittest import mock
+from urllib.parse import urlparse, parse_qs
+import gateways.snow_gateway as snow_gateway
+from commands.from_snow import FromServiceNowCommand
+from metadata.evaluation_space import EvaluationSpaceMetadata
+from metadata.snow_sync_cursor import SnowSyncCursor
+from utils.settings import settings
+
+def matches(row, condition):
+    """ Evaluates a single encoded query condition against a row. """
+    for operator in [">=", ">", "="]:
+        field, found, value = condition.partition(operator)
+        if found:
+            if operator == ">=":
+                return row[field] >= value
+            if operator == ">":
+                return row[field] > value
+            return row[field] == value
+    raise ValueError(condition)
+
+class FakeTable():
+    """ Incident table answering encoded queries, with a hook run after each page. """
+
+    def __init__(self, rows, on_page=None):
+        self.rows = rows
+        self.on_page = on_page
+        self.pages = 0
+
+    def get(self, url, headers, timeout):    # pylint: disable=unused-argument
+        """ Answers a Table API request. """
+        parameters = {key: values[0] for key, values in parse_qs(urlparse(url).query).items()}
+        query = parameters["sysparm_query"]
+        conditions = [condition for condition in query.split("^") if not condition.startswith("ORDERBY")]
+        orders = [condition.removeprefix("ORDERBY") for condition in query.split("^")
+                  if condition.startswith("ORDERBY")]
+
+        # conditions before each NQ are and-ed, the groups are or-ed
+        groups = [[]]
+        for condition in conditions:
+            if condition.startswith("NQ"):
+                groups.append([])
+                condition = condition.removeprefix("NQ")
+            groups[-1].append(condition)
+        result = [dict(row) for row in self.rows
+                  if any(all(matches(row, condition) for condition in group) for group in groups)]
+        result.sort(key=lambda row: tuple(row[field] for field in orders))
+
+        offset = int(parameters["sysparm_offset"])
+        limit = int(parameters["sysparm_limit"])
+        response = mock.Mock(status_code=200, headers={"X-Total-Count": str(len(result))})
+        response.json.return_value = {"result": result[offset:offset + limit]}
+
+        self.pages += 1
+        if self.on_page is not None:
+            self.on_page(self)
+        return response
+
+class TestIncrementalSync(unittest.TestCase):
+    """ Tests for FromServiceNowCommand incremental syncs. """
+
+    def setUp(self):
+        settings.SERVICE_NOW_INSTANCE = "instance"
+        settings.SERVICE_NOW_USERNAME = "user"
+        settings.SERVICE_NOW_PASSWORD = "password"
+        settings.SERVICE_NOW_PAGE_SIZE = 100
+        self.metadata = EvaluationSpaceMetadata(id="space")
+        self.metadata.snow_sync_cursor = SnowSyncCursor(updated_on="2025-01-01 00:00:00")
+        self.uploaded = []
+
+        def upload_stream(_, chunks):
+            self.uploaded.extend(line for chunk in chunks for line in chunk.splitlines())
+            return 0
+
+        gateway = mock.Mock()
+        gateway.upload_stream.side_effect = upload_stream
+        for target, value in [("commands.from_snow.load_metadata", lambda _: self.metadata),
+                              ("commands.from_snow.save_metadata", mock.Mock()),
+                              ("commands.from_snow.update_dedup_index", mock.Mock()),
+                              ("commands.from_snow.ObjectStorageGateway", lambda: gateway)]:
+            patcher = mock.patch(target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def sync(self, table):
+        """ Runs an incremental sync against the table. """
+        with mock.patch.object(snow_gateway, "get_snow_session", lambda: table):
+            command = FromServiceNowCommand(space_id="space", incremental=True, field_profile="full")
+            command.go()
+        return command
+
+    def test_row_updated_mid_pull_is_not_skipped(self):
+        """ An incident updated while paging is pulled along with every other incident. """
+        rows = [{"sys_id": f"s{i:04d}", "number": f"INC{i}",
+                 "sys_updated_on": f"2025-01-01 0{i // 1000}:{(i // 20) % 60:02d}:00"}
+                for i in range(250)]
+
+        # update an incident already read once the first page has been returned
+        def update_first_row(table):
+            if table.pages == 1:
+                table.rows[0]["sys_updated_on"] = "2025-01-01 05:00:00"
+        command = self.sync(FakeTable(rows, update_first_row))
+
+        pulled = {line.split('"sys_id": "')[1].split('"')[0] for line in self.uploaded}
+        self.assertEqual(pulled, {row["sys_id"] for row in rows})
+        self.assertIn('"sys_updated_on": "2025-01-01 05:00:00"', self.uploaded[-1])
+        self.assertEqual(command.sync_cursor.updated_on, "2025-01-01 05:00:00")
+
+    def test_pages_share_a_timestamp(self):
+        """ Incidents sharing a timestamp across several pages are each pulled once. """
+        rows = [{"sys_id": f"s{i:04d}", "number": f"INC{i}", "sys_updated_on": "2025-01-02 00:00:00"}
+                for i in range(250)]
+        command = self.sync(FakeTable(rows))
+
+        self.assertEqual(len(self.uploaded), 250)
+        self.assertEqual(command.duplicate_count, 0)
+        self.assertEqual(len(command.sync_cursor.recent_ids), 250)
+
+if __name__ == "__main__":
+    unittest.main()
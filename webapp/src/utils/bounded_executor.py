@@ -0,0 +1,68 @@
+""" Bounded concurrency helpers for fanning work out across threads. """
+import logging
+import itertools
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator
+
+logger = logging.getLogger(__name__)
+
+def batched(items : Iterable, batch_size : int) -> Iterator[tuple]:
+    """ Splits items into tuples of batch_size items, the last of which may be shorter.
+        Equivalent to itertools.batched, which requires Python 3.12.
+
+        items - iterable of inputs
+        batch_size - maximum number of items per batch
+    """
+    # validate arguments
+    if batch_size is None or batch_size < 1:
+        msg = f"Batch Size must be a positive number!  Batch Size={batch_size}"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    iterator = iter(items)
+    while batch := tuple(itertools.islice(iterator, batch_size)):
+        yield batch
+
+def ordered_map(fn : Callable, items : Iterable, max_workers : int,
+                max_in_flight : int = None) -> Iterator:
+    """ Applies fn to every item using a pool of worker threads, yielding results in
+        the same order as the input.  Items are pulled from the iterable lazily so that
+        at most max_in_flight items are queued or running at any point in time.
+
+        fn - function to apply to each item
+        items - iterable of inputs
+        max_workers - number of worker threads
+        max_in_flight - maximum number of submitted but unconsumed items
+    """
+    # validate arguments
+    if max_workers is None or max_workers < 1:
+        msg = f"Max Workers must be a positive number!  Max Workers={max_workers}"
+        logger.error(msg)
+        raise ValueError(msg)
+    if max_in_flight is None or max_in_flight < max_workers:
+        max_in_flight = max_workers * 2
+
+    # run inline when concurrency is disabled
+    if max_workers == 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = deque()
+        try:
+            for item in items:
+                pending.append(executor.submit(fn, item))
+
+                # wait on the oldest item once the window is full
+                if len(pending) >= max_in_flight:
+                    yield pending.popleft().result()
+
+            # drain remaining work
+            while len(pending) > 0:
+                yield pending.popleft().result()
+        finally:
+            # abandon queued work on failure or early exit
+            for future in pending:
+                future.cancel()
@@ -0,0 +1,45 @@
+""" Column oriented accumulation of result rows. """
+import logging
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+class ColumnAccumulator():
+    """ Collects rows into per-column lists so that a data frame can be materialized
+        once at the end rather than growing it one row at a time.
+    """
+
+    def __init__(self, columns : list[str]):
+        """ Default Constructor
+
+            columns - column names
+        """
+        # validate arguments
+        if columns is None or len(columns) == 0:
+            msg = "Columns is a required parameter but is empty!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        self.columns = list(columns)
+        self.values = [[] for _ in self.columns]
+
+    def __len__(self) -> int:
+        """ Returns the number of accumulated rows. """
+        return len(self.values[0])
+
+    def append(self, row : list):
+        """ Appends a row of values in column order.
+
+            row - list of values
+        """
+        if len(row) != len(self.columns):
+            msg = f"Row has {len(row)} values but {len(self.columns)} columns are defined!"
+            logger.error(msg)
+            raise ValueError(msg)
+
+        for values, value in zip(self.values, row):
+            values.append(value)
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """ Materializes the accumulated rows as a data frame. """
+        return pd.DataFrame(dict(zip(self.columns, self.values)), columns=self.columns)
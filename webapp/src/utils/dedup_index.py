@@ -0,0 +1,161 @@
+""" Manage the incident de-duplication index of a space. """
+import os
+import logging
+import json
+import hashlib
+from datetime import datetime
+from gateways.object_storage_gateway import ObjectStorageGateway
+from metadata.dedup_index import DedupIndex
+from utils.bounded_executor import ordered_map, batched
+
+logger = logging.getLogger(__name__)
+
+DEDUP_INDEX_DIR = "dedup"
+DEDUP_INDEX_EXTENSION = ".json"
+KEY_FIELDS = ["sys_id", "number"]
+UPDATED_ON_FIELD = "sys_updated_on"
+MAX_FETCH_CONCURRENCY = 16
+
+def dedup_index_path(space_id : str, file : str) -> str:
+    """ Gets the name of the de-duplication index of a raw file.  Each raw file has its
+        own index so concurrent imports never rewrite each other's entries.
+
+        space_id - space id
+        file - raw file name
+    """
+    return f"{space_id}/{DEDUP_INDEX_DIR}/{os.path.basename(file)}{DEDUP_INDEX_EXTENSION}"
+
+def row_identity(row : dict):
+    """ Identifies a ServiceNow incident record by sys_id, falling back to its number.
+
+        row - incident record
+
+        Returns: (incident key, sys_updated_on) or None if the record has no identity
+    """
+    updated_on = row.get(UPDATED_ON_FIELD)
+    if not isinstance(updated_on, str):
+        updated_on = ""
+    for field in KEY_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str) and len(value) > 0:
+            return f"{field}:{value}", updated_on
+    return None
+
+def line_identity(line : str):
+    """ Identifies the incident in a raw file line.  JSON records are identified by
+        sys_id or number, any other line by a hash of its contents.
+
+        line - raw file line
+
+        Returns: (incident key, sys_updated_on) or None for blank lines
+    """
+    line = line.strip()
+    if len(line) == 0:
+        return None
+
+    # json records carry their own identity
+    if line.startswith("{"):
+        try:
+            identity = row_identity(json.loads(line))
+            if identity is not None:
+                return identity
+        except (json.JSONDecodeError, AttributeError):
+            pass
+
+    digest = hashlib.sha256(line.encode("utf-8")).hexdigest()[:32]
+    return f"sha256:{digest}", ""
+
+def update_dedup_index(space_id : str, file : str, identities):
+    """ Indexes the incidents of a newly imported raw file, replacing the index of any
+        prior version of the file.
+
+        space_id - space id
+        file - raw file name
+        identities - iterable of (incident key, sys_updated_on) or None for each row
+    """
+    # record every row, numbered as the analysis streams the file
+    dedup_index = DedupIndex(file=file, imported=datetime.now())
+    for row_index, identity in enumerate(identities, start=1):
+        if identity is not None:
+            key, updated_on = identity
+            dedup_index.entries.append((key, row_index, updated_on))
+
+    gateway = ObjectStorageGateway()
+    gateway.upload(dedup_index_path(space_id, file), dedup_index.model_dump_json())
+    logger.info("Indexed raw file.  File=%s Rows=%s", file, len(dedup_index.entries))
+
+def delete_dedup_index(space_id : str, file : str):
+    """ Deletes the de-duplication index of a deleted raw file.
+
+        space_id - space id
+        file - raw file name
+    """
+    gateway = ObjectStorageGateway()
+    gateway.delete(dedup_index_path(space_id, file))
+
+def load_dedup_indexes(space_id : str, raw_files : list[str]) -> list[DedupIndex]:
+    """ Loads the de-duplication indexes of the raw files in a space, deleting indexes
+        left behind by raw files that no longer exist.  Files imported before indexing
+        existed have no index.
+
+        space_id - space id
+        raw_files - raw files currently in the space
+    """
+    gateway = ObjectStorageGateway()
+    paths = {dedup_index_path(space_id, file): file for file in raw_files}
+    index_files = gateway.list(f"{space_id}/{DEDUP_INDEX_DIR}/")
+
+    # remove indexes of deleted raw files
+    stale = [path for path in index_files if path not in paths]
+    for batch in batched(stale, gateway.MAX_DELETE_BATCH_SIZE):
+        failed_keys = gateway.delete_batch(list(batch))
+        if len(failed_keys) > 0:
+            logger.warning("Unable to delete stale dedup indexes.  Keys=%s", failed_keys)
+
+    # load the remaining indexes concurrently
+    def load_index(path):
+        dedup_index = DedupIndex.model_validate_json(gateway.download(path))
+        dedup_index.file = paths[path]
+        return dedup_index
+    index_files = [path for path in index_files if path in paths]
+    max_workers = max(1, min(MAX_FETCH_CONCURRENCY, len(index_files)))
+    dedup_indexes = list(ordered_map(load_index, index_files, max_workers))
+    logger.info("Loaded dedup indexes.  Space=%s Indexed Files=%s Stale=%s",
+                space_id, len(dedup_indexes), len(stale))
+    return dedup_indexes
+
+def find_duplicates(dedup_indexes : list[DedupIndex]) -> set:
+    """ Finds the rows holding superseded copies of an incident.  The most recently
+        updated copy is kept, with ties going to the most recently imported file and
+        then the last row.
+
+        dedup_indexes - de-duplication indexes of the raw files in the space
+
+        Returns: set of (file, row) tuples to skip
+    """
+    newest = {}
+    copies = []
+    for dedup_index in dedup_indexes:
+        imported = dedup_index.imported.isoformat() if dedup_index.imported else ""
+        for key, row_index, updated_on in dedup_index.entries:
+            copy = (updated_on, imported, dedup_index.file, row_index)
+            copies.append((key, copy))
+            if key not in newest or copy > newest[key]:
+                newest[key] = copy
+
+    return {(copy[2], copy[3]) for key, copy in copies if copy != newest[key]}
+
+def indexed_rows(dedup_indexes : list[DedupIndex], raw_files : list[str]) -> set:
+    """ Gets every indexed row in a set of raw files.
+
+        dedup_indexes - de-duplication indexes of the raw files in the space
+        raw_files - raw files
+
+        Returns: set of (file, row) tuples
+    """
+    raw_files = set(raw_files)
+    rows = set()
+    for dedup_index in dedup_indexes:
+        if dedup_index.file in raw_files:
+            rows.update((dedup_index.file, row_index) for _, row_index, _ in dedup_index.entries)
+    return rows
@@ -13,6 +13,7 @@ class Prompts:
     # filenames
     STEP_1_SUMMARIZE_FILENAME : str = "step_1_summarize.txt"
     STEP_2_ANALYZE_FILENAME : str = "step_2_analyze.txt"
+    STEP_2_ANALYZE_BATCH_FILENAME : str = "step_2_analyze_batch.txt"
     ROLLUP_SUBCATEGORIES_FILENAME : str = "rollup_subcategories.txt"
     SUMMARIZE_ANALYSIS_FILENAME : str = "summarize_analysis.txt"
 
@@ -20,6 +21,7 @@ class Prompts:
     # pylint: disable=invalid-name
     STEP_1_SUMMARIZE : str = None
     STEP_2_ANALYZE : str = None
+    STEP_2_ANALYZE_BATCH : str = None
     ROLLUP_SUBCATEGORIES : str = None
     SUMMARIZE_ANALYSIS : str = None
 
@@ -31,6 +33,7 @@ class Prompts:
         """ Default Constructor """
         self.STEP_1_SUMMARIZE = self.load_prompt(self.STEP_1_SUMMARIZE_FILENAME)
         self.STEP_2_ANALYZE = self.load_prompt(self.STEP_2_ANALYZE_FILENAME)
+        self.STEP_2_ANALYZE_BATCH = self.load_prompt(self.STEP_2_ANALYZE_BATCH_FILENAME)
         self.ROLLUP_SUBCATEGORIES = self.load_prompt(self.ROLLUP_SUBCATEGORIES_FILENAME)
         self.SUMMARIZE_ANALYSIS = self.load_prompt(self.SUMMARIZE_ANALYSIS_FILENAME)
 
@@ -0,0 +1,79 @@
+""" Manage the daily incident rollups behind the heat maps. """
+import logging
+from io import BytesIO
+import pandas as pd
+from gateways.object_storage_gateway import ObjectStorageGateway
+
+logger = logging.getLogger(__name__)
+
+HEAT_MAP_ROLLUPS_FILENAME = "heat_map_rollups.parquet"
+ROLLUP_DIMENSIONS = ["Asset", "Category", "Subcategory"]
+ROLLUP_DATE_COLUMN = "Date_Reported"
+ROLLUP_COLUMNS = ["Dimension", "Value", "Date", "Count"]
+PARQUET_COMPRESSION = "zstd"
+
+def heat_map_rollups_path(space_id : str) -> str:
+    """ Gets the name of the heat map rollups file for a space.
+
+        space_id - space id
+    """
+    return f"{space_id}/{HEAT_MAP_ROLLUPS_FILENAME}"
+
+def build_heat_map_rollups(df : pd.DataFrame) -> pd.DataFrame:
+    """ Counts incidents per day for every value of each heat map dimension.  Incidents
+        without a report date or dimension value are not counted.
+
+        df - analysis data frame
+
+        Returns: data frame with Dimension, Value, Date and Count columns
+    """
+    if ROLLUP_DATE_COLUMN not in df.columns:
+        return pd.DataFrame([], columns=ROLLUP_COLUMNS)
+    dates = pd.to_datetime(df[ROLLUP_DATE_COLUMN]).dt.normalize().rename("Date")
+
+    rollups = []
+    for dimension in ROLLUP_DIMENSIONS:
+        if dimension not in df.columns:
+            continue
+        values = df[dimension].astype("string").rename("Value")
+        counts = df.groupby([values, dates], observed=True).size()
+        counts = counts.rename("Count").reset_index()
+        counts.insert(0, "Dimension", dimension)
+        rollups.append(counts)
+    if len(rollups) == 0:
+        return pd.DataFrame([], columns=ROLLUP_COLUMNS)
+
+    rollup_df = pd.concat(rollups, ignore_index=True)
+    rollup_df["Dimension"] = rollup_df["Dimension"].astype("category")
+    rollup_df["Value"] = rollup_df["Value"].astype("category")
+    rollup_df["Count"] = rollup_df["Count"].astype("int32")
+    return rollup_df[ROLLUP_COLUMNS]
+
+def save_heat_map_rollups(space_id : str, df : pd.DataFrame) -> pd.DataFrame:
+    """ Builds and saves the heat map rollups for a space.
+
+        space_id - space id
+        df - analysis data frame
+
+        Returns: heat map rollups
+    """
+    # validate input
+    if space_id is None or len(space_id) == 0:
+        msg = "The provided Space ID is empty!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    rollup_df = build_heat_map_rollups(df)
+    parquet = rollup_df.to_parquet(index=False, compression=PARQUET_COMPRESSION)
+    gateway = ObjectStorageGateway()
+    gateway.upload(heat_map_rollups_path(space_id), parquet)
+    logger.info("Saved heat map rollups.  Space=%s Rows=%s", space_id, len(rollup_df))
+
+    return rollup_df
+
+def read_heat_map_rollups(contents : bytes) -> pd.DataFrame:
+    """ Parses heat map rollups saved as parquet.
+
+        contents - parquet file contents
+    """
+    return pd.read_parquet(BytesIO(contents))
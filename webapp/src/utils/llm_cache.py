@@ -0,0 +1,174 @@
+""" Persistent, content addressed cache for LLM responses. """
+import os
+import atexit
+import logging
+import hashlib
+import sqlite3
+import threading
+import time
+from utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class LLMCache():
+    """ Caches LLM responses on local disk keyed on a hash of the model, system prompt
+        and input text.  The least recently used entries are evicted once the cache
+        grows beyond its size limit.  Access times are buffered in memory and written
+        in batches so cache hits do not each commit to disk.
+    """
+
+    # constants
+    MAX_PENDING_ACCESS = 256
+
+    def __init__(self, path : str, max_size_bytes : int):
+        """ Default Constructor
+
+            path - sqlite database file (empty to disable caching)
+            max_size_bytes - maximum combined size of cached responses
+        """
+        self.path = path
+        self.max_size_bytes = max_size_bytes
+        self.connection = None
+        self.size_bytes = 0
+        self.pending_access = {}
+        self.lock = threading.Lock()
+
+        # counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def is_enabled(self) -> bool:
+        """ Returns whether caching is configured. """
+        return self.path is not None and len(self.path) > 0
+
+    def get_connection(self):
+        """ Lazily opens the cache database.  Must be called while holding the lock. """
+        if self.connection is None:
+            # ensure the parent directory exists
+            abs_path = os.path.abspath(self.path)
+            os.makedirs(os.path.dirname(abs_path), exist_ok=True)
+            logger.info("Opening LLM cache.  Path=%s", abs_path)
+
+            self.connection = sqlite3.connect(abs_path, check_same_thread=False)
+            self.connection.execute("PRAGMA journal_mode=WAL")
+            self.connection.execute("""CREATE TABLE IF NOT EXISTS llm_cache (
+                                        cache_key TEXT PRIMARY KEY,
+                                        response TEXT NOT NULL,
+                                        size INTEGER NOT NULL,
+                                        last_access REAL NOT NULL)""")
+            self.connection.execute("""CREATE INDEX IF NOT EXISTS llm_cache_last_access
+                                        ON llm_cache (last_access)""")
+            self.connection.commit()
+
+            # initialize size tracking
+            row = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM llm_cache").fetchone()
+            self.size_bytes = row[0]
+        return self.connection
+
+    def make_key(self, model : str, system_prompt : str, input_text : str) -> str:
+        """ Builds the cache key for an LLM request.
+
+            model - model name
+            system_prompt - system prompt
+            input_text - user prompt
+        """
+        digest = hashlib.sha256()
+        for part in (model, system_prompt, input_text):
+            part_bytes = (part or "").encode("utf-8")
+            digest.update(str(len(part_bytes)).encode("ascii") + b":")
+            digest.update(part_bytes)
+        return digest.hexdigest()
+
+    def get(self, key : str) -> str:
+        """ Gets a cached response or None if the response is not cached.
+
+            key - cache key
+        """
+        if not self.is_enabled():
+            return None
+
+        with self.lock:
+            connection = self.get_connection()
+            row = connection.execute("SELECT response FROM llm_cache WHERE cache_key = ?",
+                                     (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+
+            # track usage for eviction, written on the next flush
+            self.pending_access[key] = time.time()
+            if len(self.pending_access) >= self.MAX_PENDING_ACCESS:
+                self.flush_access()
+                connection.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key : str, response : str):
+        """ Adds a response to the cache, evicting old entries as needed.
+
+            key - cache key
+            response - LLM response
+        """
+        if not self.is_enabled() or response is None:
+            return
+
+        size = len(response.encode("utf-8"))
+        with self.lock:
+            connection = self.get_connection()
+
+            # replace any prior entry for the key
+            row = connection.execute("SELECT size FROM llm_cache WHERE cache_key = ?",
+                                     (key,)).fetchone()
+            if row is not None:
+                self.size_bytes -= row[0]
+            connection.execute("""INSERT OR REPLACE INTO llm_cache
+                                    (cache_key, response, size, last_access)
+                                    VALUES (?, ?, ?, ?)""",
+                               (key, response, size, time.time()))
+            self.size_bytes += size
+
+            # evict least recently used entries
+            self.flush_access()
+            while self.size_bytes > self.max_size_bytes:
+                oldest = connection.execute("""SELECT cache_key, size FROM llm_cache
+                                                ORDER BY last_access LIMIT 1""").fetchone()
+                if oldest is None:
+                    break
+                connection.execute("DELETE FROM llm_cache WHERE cache_key = ?", (oldest[0],))
+                self.size_bytes -= oldest[1]
+                self.evictions += 1
+
+            connection.commit()
+
+    def flush_access(self):
+        """ Writes buffered access times to the database.  Must be called while holding
+            the lock, the caller commits.
+        """
+        if len(self.pending_access) == 0:
+            return
+        updates = [(last_access, key) for key, last_access in self.pending_access.items()]
+        self.connection.executemany("UPDATE llm_cache SET last_access = ? WHERE cache_key = ?", updates)
+        self.pending_access = {}
+
+    def close(self):
+        """ Flushes buffered access times and closes the cache database. """
+        with self.lock:
+            if self.connection is None:
+                return
+            self.flush_access()
+            self.connection.commit()
+            self.connection.close()
+            self.connection = None
+
+    def stats(self) -> dict:
+        """ Returns the cache hit/miss counters. """
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "size_bytes": self.size_bytes,
+        }
+
+llm_cache = LLMCache(settings.LLM_CACHE_PATH, settings.LLM_CACHE_MAX_SIZE_MB * 1024 * 1024)
+atexit.register(llm_cache.close)
@@ -0,0 +1,116 @@
+""" Process wide cache of parsed object storage files. """
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable
+from gateways.object_storage_gateway import ObjectStorageGateway, add_write_listener
+from utils.bounded_executor import ordered_map
+from utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class CachedObject():
+    """ Cache entry for a parsed file. """
+
+    def __init__(self, etag : str, value : Any):
+        """ Default Constructor
+
+            etag - etag of the file the value was parsed from
+            value - parsed file contents
+        """
+        self.etag = etag
+        self.value = value
+        self.checked = time.monotonic()
+
+class ObjectCache():
+    """ Caches parsed files from object storage and shares them across Streamlit
+        sessions in the process.  Entries younger than the TTL are served without any
+        I/O, older entries are revalidated with a conditional (etag) download, and
+        entries are dropped whenever this process writes the underlying file.  Loads
+        that overlap an invalidation are returned but not cached.
+    """
+
+    MAX_FETCH_CONCURRENCY : int = 16
+
+    def __init__(self, ttl_seconds : int, max_entries : int):
+        """ Default Constructor
+
+            ttl_seconds - seconds an entry is served before being revalidated
+            max_entries - maximum number of cached files
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.generation = 0
+        self.lock = threading.Lock()
+        add_write_listener(self.invalidate)
+
+    def get(self, key : str, fn_parse : Callable[[str], Any]) -> Any:
+        """ Gets the parsed contents of a file, or None if the file does not exist.
+
+            key - name of file
+            fn_parse - function converting the file contents into the cached value
+        """
+        # serve fresh entries without any I/O
+        with self.lock:
+            generation = self.generation
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                if time.monotonic() - entry.checked < self.ttl_seconds:
+                    return entry.value
+
+        # revalidate or load the file
+        gateway = ObjectStorageGateway()
+        contents, etag = gateway.download_if_modified(key, entry.etag if entry else None)
+        with self.lock:
+            if etag is None:
+                self.entries.pop(key, None)
+                return None
+            if contents is None:
+                # do not revive an entry invalidated during the conditional download
+                if self.generation == generation:
+                    entry.checked = time.monotonic()
+                    self.entries[key] = entry
+                return entry.value
+
+        # parse outside of the lock
+        entry = CachedObject(etag, fn_parse(contents))
+        with self.lock:
+            if self.generation != generation:
+                return entry.value
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return entry.value
+
+    def get_many(self, keys : list[str], fn_parse : Callable[[str], Any]) -> list:
+        """ Gets the parsed contents of several files, fetching them concurrently.
+
+            keys - names of files
+            fn_parse - function converting the file contents into the cached value
+
+            Returns: list of values in the same order as keys (None for missing files)
+        """
+        if keys is None or len(keys) == 0:
+            return []
+
+        def fetch(key):
+            return self.get(key, fn_parse)
+
+        max_workers = max(1, min(self.MAX_FETCH_CONCURRENCY, len(keys)))
+        return list(ordered_map(fetch, keys, max_workers))
+
+    def invalidate(self, key : str):
+        """ Drops the cached copy of a file.
+
+            key - name of file
+        """
+        with self.lock:
+            self.generation += 1
+            if self.entries.pop(key, None) is not None:
+                logger.debug("Invalidated cached file.  Key=%s", key)
+
+object_cache = ObjectCache(settings.OBJECT_CACHE_TTL_SECONDS, settings.OBJECT_CACHE_MAX_ENTRIES)
@@ -0,0 +1,67 @@
+""" Process wide cache of values computed on a background worker pool. """
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+class PrefetchCache():
+    """ Caches computed values shared across Streamlit sessions in the process.  Values
+        can be requested ahead of time so they are computed in the background while the
+        current page renders.  Entries hold futures so that a value already being
+        computed is never computed twice.
+    """
+
+    def __init__(self, max_workers : int, max_entries : int):
+        """ Default Constructor
+
+            max_workers - number of background worker threads
+            max_entries - maximum number of cached values
+        """
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.executor = ThreadPoolExecutor(max_workers=max_workers,
+                                           thread_name_prefix="prefetch_cache")
+
+    def submit(self, key : Hashable, fn : Callable[[], Any]) -> Future:
+        """ Gets the future for a value, scheduling its computation if not yet cached.
+
+            key - cache key
+            fn - function computing the value
+        """
+        with self.lock:
+            future = self.entries.get(key)
+            if future is None:
+                future = self.executor.submit(fn)
+                self.entries[key] = future
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+        return future
+
+    def get(self, key : Hashable, fn : Callable[[], Any]) -> Any:
+        """ Gets a value, computing it if not yet cached or prefetched.
+
+            key - cache key
+            fn - function computing the value
+        """
+        future = self.submit(key, fn)
+        try:
+            return future.result()
+        except Exception:
+            # do not cache failures so the next request retries
+            with self.lock:
+                if self.entries.get(key) is future:
+                    del self.entries[key]
+            raise
+
+    def prefetch(self, key : Hashable, fn : Callable[[], Any]):
+        """ Schedules a value to be computed in the background.
+
+            key - cache key
+            fn - function computing the value
+        """
+        self.submit(key, fn)
@@ -0,0 +1,59 @@
+""" Thread safe rate limiting for outbound service requests. """
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class RateLimiter():
+    """ Token bucket rate limiter shared by all threads calling a single endpoint. """
+
+    def __init__(self, requests_per_second : float):
+        """ Default Constructor
+
+            requests_per_second - maximum sustained request rate (<= 0 for unlimited)
+        """
+        self.requests_per_second = requests_per_second
+        self.capacity = max(1.0, requests_per_second)
+        self.tokens = self.capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """ Blocks until the caller is allowed to issue another request. """
+        if self.requests_per_second is None or self.requests_per_second <= 0:
+            return
+
+        while True:
+            with self.lock:
+                # refill bucket based on elapsed time
+                now = time.monotonic()
+                elapsed = now - self.last_refill
+                self.tokens = min(self.capacity, self.tokens + elapsed * self.requests_per_second)
+                self.last_refill = now
+
+                # consume a token if one is available
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait_time = (1 - self.tokens) / self.requests_per_second
+
+            logger.debug("Rate limit reached.  Waiting %s seconds", wait_time)
+            time.sleep(wait_time)
+
+_rate_limiters : dict[str, RateLimiter] = {}
+_rate_limiters_lock = threading.Lock()
+
+def get_rate_limiter(endpoint : str, requests_per_second : float) -> RateLimiter:
+    """ Gets the process wide rate limiter for the provided endpoint.
+
+        endpoint - endpoint url or other identifier for the rate limited service
+        requests_per_second - maximum sustained request rate (<= 0 for unlimited)
+    """
+    with _rate_limiters_lock:
+        rate_limiter = _rate_limiters.get(endpoint)
+        if rate_limiter is None or rate_limiter.requests_per_second != requests_per_second:
+            logger.info("Creating rate limiter.  Endpoint=%s Rate=%s", endpoint, requests_per_second)
+            rate_limiter = RateLimiter(requests_per_second)
+            _rate_limiters[endpoint] = rate_limiter
+        return rate_limiter
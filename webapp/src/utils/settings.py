@@ -36,6 +36,56 @@ class Settings(BaseSettings):
             "description": "OpenAI Model Name",
         },
     )
+    OPENAI_MAX_REQUESTS_PER_SECOND: float = Field(
+        default=0,
+        json_schema_extra={
+            "env": "OPENAI_MAX_REQUESTS_PER_SECOND",
+            "description": "Maximum inference requests per second sent to the OpenAI endpoint",
+            "example": "0 for unlimited,5",
+        },
+    )
+
+    # Incident Analysis Configuration
+    ANALYSIS_CONCURRENCY: int = Field(
+        default=4,
+        json_schema_extra={
+            "env": "ANALYSIS_CONCURRENCY",
+            "description": "Number of incidents classified in parallel during analysis",
+            "example": "1 for serial,8",
+        },
+    )
+    ANALYSIS_CHECKPOINT_INTERVAL: int = Field(
+        default=100,
+        json_schema_extra={
+            "env": "ANALYSIS_CHECKPOINT_INTERVAL",
+            "description": "Number of classified incidents saved per analysis checkpoint shard",
+        },
+    )
+    ANALYSIS_BATCH_SIZE: int = Field(
+        default=1,
+        json_schema_extra={
+            "env": "ANALYSIS_BATCH_SIZE",
+            "description": "Number of incident summaries analyzed per step 2 LLM request",
+            "example": "1 for unbatched,10",
+        },
+    )
+
+    # LLM response cache
+    LLM_CACHE_PATH: str = Field(
+        default="./cache/llm_cache.db",
+        json_schema_extra={
+            "env": "LLM_CACHE_PATH",
+            "description": "Location of the incident analysis LLM response cache",
+            "example": "empty to disable,./cache/llm_cache.db",
+        },
+    )
+    LLM_CACHE_MAX_SIZE_MB: int = Field(
+        default=256,
+        json_schema_extra={
+            "env": "LLM_CACHE_MAX_SIZE_MB",
+            "description": "Maximum size of cached LLM responses before eviction",
+        },
+    )
 
     # Agent Connection Info
     AUTOMATE_AGENT_MCP_URL: str = Field(
@@ -75,6 +125,41 @@ class Settings(BaseSettings):
             "description": "Service Now Password",
         },
     )
+    SERVICE_NOW_PAGE_SIZE: int = Field(
+        default=1000,
+        json_schema_extra={
+            "env": "SERVICE_NOW_PAGE_SIZE",
+            "description": "Number of incidents requested per Service Now page",
+        },
+    )
+    SERVICE_NOW_CONCURRENCY: int = Field(
+        default=4,
+        json_schema_extra={
+            "env": "SERVICE_NOW_CONCURRENCY",
+            "description": "Number of Service Now pages fetched concurrently",
+        },
+    )
+    SERVICE_NOW_MAX_RETRIES: int = Field(
+        default=5,
+        json_schema_extra={
+            "env": "SERVICE_NOW_MAX_RETRIES",
+            "description": "Maximum retries for throttled (429) or failed (5xx) Service Now requests",
+        },
+    )
+    SERVICE_NOW_FIELD_PROFILE: str = Field(
+        default="classification",
+        json_schema_extra={
+            "env": "SERVICE_NOW_FIELD_PROFILE",
+            "description": "Default set of incident fields pulled from Service Now (classification or full)",
+        },
+    )
+    SERVICE_NOW_SYNC_LOOKBACK_SECONDS: int = Field(
+        default=300,
+        json_schema_extra={
+            "env": "SERVICE_NOW_SYNC_LOOKBACK_SECONDS",
+            "description": "Seconds before the sync cursor that incremental Service Now pulls re-read",
+        },
+    )
 
     # API Timeout
     API_TIMEOUT: int = Field(
@@ -123,5 +208,47 @@ class Settings(BaseSettings):
             "description": "Object Storage Bucket (i.e. Working Directory)",
         },
     )
+    OBJECT_STORAGE_MAX_POOL_CONNECTIONS: int = Field(
+        default=50,
+        json_schema_extra={
+            "env": "OBJECT_STORAGE_MAX_POOL_CONNECTIONS",
+            "description": "Maximum number of pooled connections to Object Storage",
+        },
+    )
+    OBJECT_STORAGE_MAX_ATTEMPTS: int = Field(
+        default=5,
+        json_schema_extra={
+            "env": "OBJECT_STORAGE_MAX_ATTEMPTS",
+            "description": "Maximum attempts for retryable Object Storage requests",
+        },
+    )
+    SPACE_INDEX_MAX_AGE_SECONDS: int = Field(
+        default=3600,
+        json_schema_extra={
+            "env": "SPACE_INDEX_MAX_AGE_SECONDS",
+            "description": "Age after which the space index is rebuilt from the space metadata files",
+        },
+    )
+    OBJECT_CACHE_TTL_SECONDS: int = Field(
+        default=30,
+        json_schema_extra={
+            "env": "OBJECT_CACHE_TTL_SECONDS",
+            "description": "Seconds cached Object Storage files are used before being revalidated",
+        },
+    )
+    OBJECT_CACHE_MAX_ENTRIES: int = Field(
+        default=1000,
+        json_schema_extra={
+            "env": "OBJECT_CACHE_MAX_ENTRIES",
+            "description": "Maximum number of Object Storage files held in the cache",
+        },
+    )
+    SPACE_CACHE_MAX_SPACES: int = Field(
+        default=20,
+        json_schema_extra={
+            "env": "SPACE_CACHE_MAX_SPACES",
+            "description": "Maximum number of loaded Evaluation Spaces held in the cache",
+        },
+    )
 
 settings = Settings()
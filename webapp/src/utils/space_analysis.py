@@ -0,0 +1,263 @@
+""" Manage the space analysis files. """
+import logging
+from datetime import datetime
+from io import BytesIO, StringIO
+import pandas as pd
+import pyarrow.parquet as pq
+from gateways.object_storage_gateway import ObjectStorageGateway
+from utils.bounded_executor import ordered_map, batched
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_PARQUET_FILENAME = "analysis.parquet"
+ANALYSIS_CSV_FILENAME = "analysis.csv"
+PARQUET_COMPRESSION = "zstd"
+PARTITION_DIR = "analysis"
+PARTITION_PREFIX = "month="
+PARTITION_FILENAME = "part.parquet"
+PARTITION_COLUMN = "Date_Reported"
+PARTITION_FORMAT = "%Y-%m"
+UNKNOWN_PARTITION = "unknown"
+MAX_PARTITION_CONCURRENCY = 8
+
+DATE_COLUMNS = ["Date_Reported", "Date_Resolved"]
+BOOLEAN_COLUMNS = ["Is_Manual", "Is_Outage"]
+CATEGORY_COLUMNS = ["Incident_File", "Asset", "Category", "Subcategory", "Status"]
+BOOLEAN_VALUES = {"true": True, "false": False, "yes": True, "no": False, "1": True, "0": False}
+
+def analysis_parquet_path(space_id : str) -> str:
+    """ Gets the name of the columnar analysis file for a space.
+
+        space_id - space id
+    """
+    return f"{space_id}/{ANALYSIS_PARQUET_FILENAME}"
+
+def analysis_csv_path(space_id : str) -> str:
+    """ Gets the name of the CSV analysis export for a space.
+
+        space_id - space id
+    """
+    return f"{space_id}/{ANALYSIS_CSV_FILENAME}"
+
+def analysis_partition_path(space_id : str, month : str) -> str:
+    """ Gets the name of the analysis partition holding incidents reported in a month.
+
+        space_id - space id
+        month - month as YYYY-MM (or UNKNOWN_PARTITION for undated incidents)
+    """
+    return f"{space_id}/{PARTITION_DIR}/{PARTITION_PREFIX}{month}/{PARTITION_FILENAME}"
+
+def normalize_analysis(df : pd.DataFrame) -> pd.DataFrame:
+    """ Converts analysis columns to their datetime, boolean and category types.
+
+        df - analysis data frame
+    """
+    df = df.copy(deep=False)
+    for column in DATE_COLUMNS:
+        if column in df.columns:
+            df[column] = pd.to_datetime(df[column], format="mixed", errors="coerce")
+    for column in BOOLEAN_COLUMNS:
+        if column in df.columns and df[column].dtype != "boolean":
+            values = df[column].astype("string").str.strip().str.lower()
+            df[column] = values.map(BOOLEAN_VALUES).astype("boolean")
+    for column in CATEGORY_COLUMNS:
+        if column in df.columns:
+            df[column] = df[column].astype("category")
+    return df
+
+def read_analysis_parquet(contents : bytes, columns : list[str] = None) -> pd.DataFrame:
+    """ Parses an analysis saved as parquet.
+
+        contents - parquet file contents
+        columns - only read these columns when present (None for all columns)
+    """
+    if columns is not None:
+        names = pq.read_schema(BytesIO(contents)).names
+        columns = [column for column in columns if column in names]
+    return pd.read_parquet(BytesIO(contents), columns=columns)
+
+def read_analysis_csv(contents : str, columns : list[str] = None) -> pd.DataFrame:
+    """ Parses an analysis saved as CSV.
+
+        contents - csv file contents
+        columns - only read these columns when present (None for all columns)
+    """
+    df = pd.read_csv(StringIO(contents),
+                     usecols=(lambda column: column in columns) if columns is not None else None)
+    return normalize_analysis(df)
+
+def save_analysis(space_id : str, df : pd.DataFrame) -> pd.DataFrame:
+    """ Saves the analysis for a space as parquet along with a CSV export.
+
+        space_id - space id
+        df - analysis data frame
+
+        Returns: the analysis with normalized column types
+    """
+    # validate input
+    if space_id is None or len(space_id) == 0:
+        msg = "The provided Space ID is empty!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    gateway = ObjectStorageGateway()
+    df = normalize_analysis(df)
+
+    # save columnar copy used by the web front end
+    parquet = df.to_parquet(index=False, compression=PARQUET_COMPRESSION)
+    gateway.upload(analysis_parquet_path(space_id), parquet)
+
+    # save csv export
+    gateway.upload(analysis_csv_path(space_id), df.to_csv(index=False))
+
+    # save monthly partitions so date ranges can be loaded on their own
+    save_analysis_partitions(gateway, space_id, df)
+
+    return df
+
+def save_analysis_partitions(gateway : ObjectStorageGateway, space_id : str, df : pd.DataFrame):
+    """ Saves the analysis partitioned by the month each incident was reported in and
+        removes partitions for months that no longer have incidents.
+
+        gateway - object storage gateway
+        space_id - space id
+        df - analysis data frame with normalized column types
+    """
+    existing = list_analysis_partitions(space_id)
+
+    # split rows by report month
+    months = df[PARTITION_COLUMN].dt.strftime(PARTITION_FORMAT).fillna(UNKNOWN_PARTITION)
+    partitions = list(df.groupby(months, sort=True, observed=True))
+
+    def upload_partition(partition):
+        month, partition_df = partition
+        parquet = partition_df.to_parquet(index=False, compression=PARQUET_COMPRESSION)
+        path = analysis_partition_path(space_id, month)
+        gateway.upload(path, parquet)
+        return path
+
+    max_workers = max(1, min(MAX_PARTITION_CONCURRENCY, len(partitions)))
+    saved = set(ordered_map(upload_partition, partitions, max_workers))
+    logger.info("Saved analysis partitions.  Space=%s Partitions=%s", space_id, len(saved))
+
+    # remove partitions left over from a prior analysis
+    stale = [path for path in existing.values() if path not in saved]
+    for batch in batched(stale, gateway.MAX_DELETE_BATCH_SIZE):
+        failed_keys = gateway.delete_batch(list(batch))
+        if len(failed_keys) > 0:
+            logger.warning("Unable to delete stale analysis partitions.  Keys=%s", failed_keys)
+
+def list_analysis_partitions(space_id : str) -> dict[str, str]:
+    """ Lists the analysis partitions saved for a space.
+
+        space_id - space id
+
+        Returns: dictionary of month (YYYY-MM or UNKNOWN_PARTITION) to file name
+    """
+    gateway = ObjectStorageGateway()
+    prefix = f"{space_id}/{PARTITION_DIR}/{PARTITION_PREFIX}"
+    partitions = {}
+    for path in gateway.list(prefix):
+        month, _, filename = path.removeprefix(prefix).partition("/")
+        if filename == PARTITION_FILENAME:
+            partitions[month] = path
+    return partitions
+
+def count_undated_analysis(space_id : str) -> int:
+    """ Counts the incidents without a report date from the undated partition alone.
+        Returns None if the space has no partitions.
+
+        space_id - space id
+    """
+    partitions = list_analysis_partitions(space_id)
+    if len(partitions) == 0:
+        return None
+    path = partitions.get(UNKNOWN_PARTITION)
+    if path is None:
+        return 0
+    gateway = ObjectStorageGateway()
+    return pq.ParquetFile(BytesIO(gateway.download_bytes(path))).metadata.num_rows
+
+def load_analysis_range(space_id : str, date_from : datetime = None, date_to : datetime = None,
+                        columns : list[str] = None) -> pd.DataFrame:
+    """ Loads the analysis rows reported within a date range, reading only the monthly
+        partitions that intersect it.  Returns None if the space has no partitions.
+
+        space_id - space id
+        date_from - earliest report date, inclusive (None for no lower bound)
+        date_to - latest report date, inclusive (None for no upper bound)
+        columns - only read these columns (None for all columns)
+    """
+    partitions = list_analysis_partitions(space_id)
+    if len(partitions) == 0:
+        return None
+
+    # select the months intersecting the range, undated incidents only without bounds
+    month_from = date_from.strftime(PARTITION_FORMAT) if date_from is not None else None
+    month_to = date_to.strftime(PARTITION_FORMAT) if date_to is not None else None
+    paths = []
+    for month, path in sorted(partitions.items()):
+        if month == UNKNOWN_PARTITION:
+            if month_from is None and month_to is None:
+                paths.append(path)
+            continue
+        if month_from is not None and month < month_from:
+            continue
+        if month_to is not None and month > month_to:
+            continue
+        paths.append(path)
+
+    # the partition column is needed to trim rows outside of the range
+    read_columns = columns
+    if columns is not None and PARTITION_COLUMN not in columns:
+        read_columns = list(columns) + [PARTITION_COLUMN]
+
+    # read the selected partitions concurrently
+    gateway = ObjectStorageGateway()
+    def read_partition(path):
+        return read_analysis_parquet(gateway.download_bytes(path), read_columns)
+    max_workers = max(1, min(MAX_PARTITION_CONCURRENCY, len(paths)))
+    frames = list(ordered_map(read_partition, paths, max_workers))
+    if len(frames) == 0:
+        logger.info("No analysis partitions in range.  Space=%s From=%s To=%s",
+                    space_id, date_from, date_to)
+        return pd.DataFrame([], columns=columns)
+    df = normalize_analysis(pd.concat(frames, ignore_index=True))
+
+    # trim rows outside of the range
+    if date_from is not None:
+        df = df[df[PARTITION_COLUMN] >= date_from]
+    if date_to is not None:
+        df = df[df[PARTITION_COLUMN] <= date_to]
+    if read_columns is not columns:
+        df = df[[column for column in columns if column in df.columns]]
+
+    logger.info("Loaded analysis range.  Space=%s From=%s To=%s Partitions=%s Shape=%s",
+                space_id, date_from, date_to, len(paths), df.shape)
+    return df.reset_index(drop=True)
+
+def load_analysis(space_id : str, columns : list[str] = None,
+                  analysis_files : list[str] = None) -> pd.DataFrame:
+    """ Loads the analysis for a space, or None if the space has not been analyzed.
+        Spaces analyzed before the parquet copy existed are read from the CSV export.
+
+        space_id - space id
+        columns - only read these columns when present (None for all columns)
+        analysis_files - files known to exist in the space (None to check storage)
+    """
+    gateway = ObjectStorageGateway()
+    parquet_path = analysis_parquet_path(space_id)
+    csv_path = analysis_csv_path(space_id)
+    if analysis_files is None:
+        analysis_files = gateway.list(f"{space_id}/analysis.")
+
+    if parquet_path in analysis_files:
+        df = read_analysis_parquet(gateway.download_bytes(parquet_path), columns)
+    elif csv_path in analysis_files:
+        logger.info("No parquet analysis, reading CSV export.  Space=%s", space_id)
+        df = read_analysis_csv(gateway.download(csv_path), columns)
+    else:
+        return None
+
+    logger.info("Loaded analysis.  Space=%s Shape=%s", space_id, df.shape)
+    return df
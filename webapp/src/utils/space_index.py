@@ -0,0 +1,185 @@
+""" Manage the index of evaluation spaces. """
+import logging
+from datetime import datetime, timedelta
+from typing import Callable
+from pydantic import ValidationError
+from gateways.object_storage_gateway import ObjectStorageGateway
+from metadata.evaluation_space import EvaluationSpaceMetadata
+from metadata.space_index import SpaceIndex
+from utils.object_cache import object_cache
+from utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+SPACE_INDEX_PATH = "spaces_index.json"
+MAX_INDEX_WRITE_ATTEMPTS = 5
+
+def parse_metadata(contents : str) -> EvaluationSpaceMetadata:
+    """ Parses a space metadata file.
+
+        contents - metadata.json file contents
+    """
+    if contents is None or len(contents) == 0:
+        msg = "Contents of metadata.json is empty!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    return EvaluationSpaceMetadata.model_validate_json(contents)
+
+def summarize_metadata(metadata : EvaluationSpaceMetadata) -> EvaluationSpaceMetadata:
+    """ Creates the subset of the space metadata kept in the index.
+
+        metadata - space metadata
+    """
+    summary = EvaluationSpaceMetadata()
+    summary.id = metadata.id
+    summary.name = metadata.name
+    summary.description = metadata.description
+    summary.last_analysis_date = metadata.last_analysis_date
+    return summary
+
+def parse_space_index(contents : str) -> SpaceIndex:
+    """ Parses the space index, returning None if it is empty or invalid.
+
+        contents - space index file contents
+    """
+    if contents is None or len(contents) == 0:
+        return None
+
+    try:
+        return SpaceIndex.model_validate_json(contents)
+    except ValidationError as e:
+        logger.error("Space index is invalid.  Path=%s Error=%s", SPACE_INDEX_PATH, e)
+        return None
+
+def load_space_index(cached : bool = False) -> SpaceIndex:
+    """ Loads the space index, returning None if it is missing or unreadable.
+
+        cached - serve the index from the process wide object cache (read only use)
+    """
+    if cached:
+        space_index = object_cache.get(SPACE_INDEX_PATH, parse_space_index)
+    else:
+        gateway = ObjectStorageGateway()
+        space_index = parse_space_index(gateway.download_if_exists(SPACE_INDEX_PATH))
+
+    if space_index is None:
+        logger.warning("Space index does not exist.  Path=%s", SPACE_INDEX_PATH)
+    return space_index
+
+def is_space_index_stale(space_index : SpaceIndex) -> bool:
+    """ Determines whether the index is old enough that it should be rebuilt.
+
+        space_index - space index
+    """
+    if space_index is None or space_index.rebuilt is None:
+        return True
+    max_age = timedelta(seconds=settings.SPACE_INDEX_MAX_AGE_SECONDS)
+    return datetime.now() - space_index.rebuilt > max_age
+
+def save_space_index(space_index : SpaceIndex):
+    """ Saves the provided space index.
+
+        space_index - space index
+    """
+    # validate input
+    if space_index is None:
+        msg = "Space index provided as input is empty!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    gateway = ObjectStorageGateway()
+    gateway.upload(SPACE_INDEX_PATH, space_index.model_dump_json(exclude_defaults=True))
+
+def rebuild_space_index() -> SpaceIndex:
+    """ Rebuilds the space index from the metadata file in each space. """
+    logger.warning("Rebuilding space index.  Path=%s", SPACE_INDEX_PATH)
+
+    space_index = SpaceIndex()
+    space_index.rebuilt = datetime.now()
+
+    # load the metadata for each space concurrently
+    gateway = ObjectStorageGateway()
+    space_prefixes = gateway.list_prefixes()
+    metadata_files = [f"{space_prefix}metadata.json" for space_prefix in space_prefixes]
+    metadata_list = object_cache.get_many(metadata_files, parse_metadata)
+    for file, metadata in zip(metadata_files, metadata_list):
+        if metadata is None:
+            logger.debug("Skipping folder with no metadata.json.  File=%s", file)
+            continue
+        space_index.spaces.append(summarize_metadata(metadata))
+
+    save_space_index(space_index)
+    return space_index
+
+def modify_space_index(fn_modify : Callable[[SpaceIndex], bool]):
+    """ Applies a change to the space index, writing it only if no other writer changed
+        the index since it was read and retrying otherwise.  A missing index is rebuilt,
+        which already reflects the change.
+
+        fn_modify - function changing the index in place, returning False if unchanged
+    """
+    gateway = ObjectStorageGateway()
+    for _ in range(MAX_INDEX_WRITE_ATTEMPTS):
+        contents, etag = gateway.download_if_modified(SPACE_INDEX_PATH)
+        space_index = parse_space_index(contents)
+        if space_index is None:
+            rebuild_space_index()
+            return
+        if not fn_modify(space_index):
+            return
+        contents = space_index.model_dump_json(exclude_defaults=True)
+        if gateway.upload_if_match(SPACE_INDEX_PATH, contents, etag):
+            return
+        logger.info("Space index changed by another writer.  Retrying...  Path=%s", SPACE_INDEX_PATH)
+
+    # rebuild from the metadata files when writers keep colliding
+    logger.warning("Unable to update space index after %s attempts.  Path=%s",
+                   MAX_INDEX_WRITE_ATTEMPTS, SPACE_INDEX_PATH)
+    rebuild_space_index()
+
+def update_space_index(metadata : EvaluationSpaceMetadata):
+    """ Adds or replaces the index entry for the provided space.  The index is not
+        written when the entry is unchanged, e.g. after saving a sync cursor.
+
+        metadata - space metadata
+    """
+    # validate metadata
+    if metadata is None or metadata.id is None or len(metadata.id) == 0:
+        msg = "Metadata provided as input is empty or has no ID!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    # replace existing entry, preserving space order
+    summary = summarize_metadata(metadata)
+    def replace_entry(space_index : SpaceIndex) -> bool:
+        for index, space in enumerate(space_index.spaces):
+            if space.id == metadata.id:
+                if space == summary:
+                    return False
+                space_index.spaces[index] = summary
+                return True
+        space_index.spaces.append(summary)
+        return True
+
+    modify_space_index(replace_entry)
+
+def remove_from_space_index(space_id : str):
+    """ Removes the index entry for the provided space.
+
+        space_id - space id
+    """
+    # validate input
+    if space_id is None or len(space_id) == 0:
+        msg = "The provided Space ID is empty!"
+        logger.error(msg)
+        raise ValueError(msg)
+
+    def remove_entry(space_index : SpaceIndex) -> bool:
+        spaces = [space for space in space_index.spaces if space.id != space_id]
+        if len(spaces) == len(space_index.spaces):
+            return False
+        space_index.spaces = spaces
+        return True
+
+    modify_space_index(remove_entry)
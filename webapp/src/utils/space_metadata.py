@@ -2,6 +2,7 @@
 import logging
 from gateways.object_storage_gateway import ObjectStorageGateway
 from metadata.evaluation_space import EvaluationSpaceMetadata
+from utils.space_index import update_space_index
 
 logger = logging.getLogger(__name__)
 
@@ -46,5 +47,7 @@ def save_metadata(metadata : EvaluationSpaceMetadata):
     contents = metadata.model_dump_json()
 
     # create the evaluation space
-    gateway = ObjectStorageGateway()
     gateway.upload(path, contents)
+
+    # keep the space index in sync
+    update_space_index(metadata)
@@ -0,0 +1,101 @@
+""" Process wide cache of loaded evaluation spaces. """
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Hashable
+from gateways.object_storage_gateway import add_write_listener
+from utils.settings import settings
+
+logger = logging.getLogger(__name__)
+
+class CachedSpace():
+    """ Cache entry for a loaded space. """
+
+    def __init__(self, etags : dict[str, str], value : Any):
+        """ Default Constructor
+
+            etags - etag of every file in the space when it was loaded
+            value - loaded space state
+        """
+        self.etags = etags
+        self.value = value
+        self.checked = time.monotonic()
+
+class SpaceStateCache():
+    """ Caches the loaded state of evaluation spaces so that Streamlit reruns do no
+        object storage I/O while a space is unchanged.  Entries are dropped whenever
+        this process writes to the space, and once older than the TTL they are only
+        reused if the etags of the files in the space still match.  A space can be
+        cached in several variants, e.g. projected onto different columns.
+    """
+
+    def __init__(self, ttl_seconds : int, max_spaces : int):
+        """ Default Constructor
+
+            ttl_seconds - seconds an entry is served before being revalidated
+            max_spaces - maximum number of cached spaces
+        """
+        self.ttl_seconds = ttl_seconds
+        self.max_spaces = max_spaces
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        add_write_listener(self.invalidate_key)
+
+    def get_fresh(self, space_id : str, variant : Hashable = None) -> Any:
+        """ Gets the cached state for a space if it was validated within the TTL.
+
+            space_id - space id
+            variant - variant of the cached state
+        """
+        with self.lock:
+            entry = self.entries.get((space_id, variant))
+            if entry is None or time.monotonic() - entry.checked >= self.ttl_seconds:
+                return None
+            self.entries.move_to_end((space_id, variant))
+            return entry.value
+
+    def revalidate(self, space_id : str, etags : dict[str, str], variant : Hashable = None) -> Any:
+        """ Gets the cached state for a space if none of its files have changed.
+
+            space_id - space id
+            etags - current etag of every file in the space
+            variant - variant of the cached state
+        """
+        with self.lock:
+            entry = self.entries.get((space_id, variant))
+            if entry is None or entry.etags != etags:
+                return None
+            entry.checked = time.monotonic()
+            self.entries.move_to_end((space_id, variant))
+            return entry.value
+
+    def put(self, space_id : str, etags : dict[str, str], value : Any, variant : Hashable = None):
+        """ Caches the loaded state of a space.
+
+            space_id - space id
+            etags - etag of every file in the space when it was loaded
+            value - loaded space state
+            variant - variant of the cached state
+        """
+        with self.lock:
+            self.entries[(space_id, variant)] = CachedSpace(etags, value)
+            self.entries.move_to_end((space_id, variant))
+            while len(self.entries) > self.max_spaces:
+                self.entries.popitem(last=False)
+
+    def invalidate_key(self, key : str):
+        """ Drops every cached variant of the space containing the modified file.
+
+            key - name of modified file
+        """
+        space_id = key.split("/", 1)[0]
+        with self.lock:
+            stale = [entry_key for entry_key in self.entries if entry_key[0] == space_id]
+            for entry_key in stale:
+                del self.entries[entry_key]
+            if len(stale) > 0:
+                logger.info("Invalidated cached space.  Space=%s Key=%s", space_id, key)
+
+space_state_cache = SpaceStateCache(settings.OBJECT_CACHE_TTL_SECONDS,
+                                    settings.SPACE_CACHE_MAX_SPACES)
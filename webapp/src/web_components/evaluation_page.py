@@ -3,7 +3,7 @@ import logging
 import streamlit as st
 from commands.load_space import LoadSpacesCommand
 from web_components.actions import actions
-from web_components.evaluation_tab_summary import view_evaluation_summary
+from web_components.evaluation_tab_summary import view_evaluation_summary, SUMMARY_COLUMNS
 from web_components.evaluation_tab_analysis import view_evaluation_analysis
 from web_components.evaluation_tab_automation import view_evaluation_automation
 from web_components.evaluation_tab_import import view_evaluation_import
@@ -16,9 +16,11 @@ def view_evaluation():
     # get evaluation id
     space_id = st.query_params.space_id
 
-    # load space
+    # load space, reading only the analysis columns used by the summary, the other
+    # tabs load the rows for the months they show
     command = LoadSpacesCommand()
     command.space_id = space_id
+    command.columns = SUMMARY_COLUMNS
     command.go()
     metadata = command.metadata
 
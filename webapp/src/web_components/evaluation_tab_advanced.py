@@ -3,6 +3,8 @@ import pandas as pd
 from io import StringIO
 from web_components.actions import actions
 from gateways.object_storage_gateway import ObjectStorageGateway
+from commands.delete_space import DeleteSpaceCommand
+from utils.dedup_index import delete_dedup_index
 
 @st.dialog("View raw data file", width="large", on_dismiss="ignore", dismissible=True)
 def view_raw_data_file(gateway, filename):
@@ -28,9 +30,20 @@ def view_evaluation_advanced(space_id, command):
 
     # delete evaluation button
     if st.button("Delete Evaluation", type="primary"):
-        gateway.delete_root_dir(space_id)
-        st.query_params.action = actions.HOME
-        st.rerun()
+        progress_bar = st.progress(0.0, text="Deleting evaluation...")
+        def update_progress(processed, total):
+            progress_bar.progress(processed / total, text=f"Deleted {processed} of {total} files...")
+        delete_command = DeleteSpaceCommand()
+        delete_command.space_id = space_id
+        delete_command.fn_progress = update_progress
+        delete_command.go()
+        failed_keys = delete_command.failed_keys
+        if len(failed_keys) > 0:
+            st.error(f"Unable to delete {len(failed_keys)} files.  Please try again.")
+            st.dataframe(data={"Failed Files": failed_keys}, hide_index=True)
+        else:
+            st.query_params.action = actions.HOME
+            st.rerun()
 
     metadata = command.metadata
     raw_data_files = command.raw_data_files
@@ -85,5 +98,6 @@ def view_evaluation_advanced(space_id, command):
                     full_path = row["Path"] + "/" + row["Filename"]
                     st.write(f"Deleting file: {full_path}")
                     gateway.delete(full_path)
+                    delete_dedup_index(space_id, full_path)
                     st.write("File deleted...")
                 st.success("Files deleted!  Please refresh page.")
@@ -1,20 +1,74 @@
+import logging
 import streamlit as st
+import pandas as pd
 from commands.from_space import FromSpaceCommand
-from utils.space_metadata import load_metadata
+from utils.prefetch_cache import PrefetchCache
+from utils.space_analysis import load_analysis, load_analysis_range, count_undated_analysis
+from web_components.widget_month_range import list_months, select_month_range_widget
 
-def run_analysis(space_id):
+logger = logging.getLogger(__name__)
+
+DEFAULT_MONTHS = 3
+
+# analysis rows for the selected months, shared across reruns and sessions
+analysis_cache = PrefetchCache(max_workers=2, max_entries=8)
+
+def run_analysis(space_id, incremental=False):
     """ Runs AI Analysis against uploaded data set.
     
         space_id - space id
+        incremental - only analyze new or modified raw files
     """
     command = FromSpaceCommand()
     command.space_id = space_id
+    command.incremental = incremental
     command.go()
     st.success("Analysis Complete!")
 
+def load_analysis_months(space_id, date_from=None, date_to=None):
+    """ Loads the analysis rows reported within a range of months from the monthly
+        partitions.  Spaces analyzed before the partitions were saved are read whole.
+
+        space_id - space id
+        date_from - first day of the first month (None for no lower bound)
+        date_to - first day of the last month (None for no upper bound)
+    """
+    if date_from is not None:
+        date_from = pd.Timestamp(date_from)
+    if date_to is not None:
+        date_to = pd.Timestamp(date_to) + pd.DateOffset(months=1) - pd.Timedelta(microseconds=1)
+    df = load_analysis_range(space_id, date_from, date_to)
+    if df is not None:
+        return df
+
+    # trim the whole analysis to the range
+    logger.info("No analysis partitions, reading whole analysis.  Space=%s", space_id)
+    df = load_analysis(space_id)
+    if df is not None and date_from is not None:
+        dates = pd.to_datetime(df["Date_Reported"])
+        df = df[(dates >= date_from) & (dates <= date_to)].reset_index(drop=True)
+    return df
+
+def view_filtered_note(space_id, metadata, date_from, date_to):
+    """ Notes that the analysis is filtered to a range of months, along with the number
+        of incidents without a report date that the filter hides.
+
+        space_id - space id
+        metadata - space metadata
+        date_from - first day of the first selected month
+        date_to - first day of the last selected month
+    """
+    cache_key = (space_id, str(metadata.last_analysis_date), "undated")
+    undated_count = analysis_cache.get(cache_key, lambda: count_undated_analysis(space_id))
+
+    note = f"Showing incidents reported {date_from:%b %Y} to {date_to:%b %Y}."
+    if undated_count:
+        note += f"  {undated_count} incidents without a report date are hidden."
+    note += "  Select every month to view the full analysis."
+    st.info(note)
+
 def view_evaluation_analysis(space_id, command):
-    analysis_df = command.analysis_df
-    metadata = load_metadata(space_id)
+    metadata = command.metadata
 
     last_analysis_from = ""
     if metadata.last_analysis_date is not None:
@@ -23,12 +77,35 @@ def view_evaluation_analysis(space_id, command):
     st.header(f"AI Analysis Results{last_analysis_from}")
 
     # actions list
-    if st.button("(Re-) Run Analysis", type="primary"):
-        run_analysis(space_id)
+    col1, col2 = st.columns([0.2, 0.8])
+    with col1:
+        if st.button("(Re-) Run Analysis", type="primary"):
+            run_analysis(space_id)
+    with col2:
+        if st.button("Analyze New Files", type="secondary",
+                     help="Only analyze raw files added or modified since the last analysis"):
+            run_analysis(space_id, incremental=True)
 
-    if analysis_df is None:
+    if command.analysis_filename is None:
         st.write("Please click the 'Run Analysis' button to view analysis findings here.")
     else:
+        # select the months to display from the dates in the heat map rollups
+        date_from, date_to = None, None
+        rollups = command.heat_map_rollups
+        if rollups is not None and len(rollups) > 0:
+            month_options = list_months(rollups['Date'].min().date(), rollups['Date'].max().date())
+            start_index, end_index = select_month_range_widget(month_options, DEFAULT_MONTHS,
+                                                               key="analysis_months")
+
+            # incidents without a report date are only shown along with every month
+            if start_index > 0 or end_index < len(month_options) - 1:
+                date_from, date_to = month_options[start_index], month_options[end_index]
+                view_filtered_note(space_id, metadata, date_from, date_to)
+
+        # load only the selected months
+        cache_key = (space_id, str(metadata.last_analysis_date), date_from, date_to)
+        analysis_df = analysis_cache.get(cache_key,
+                                         lambda: load_analysis_months(space_id, date_from, date_to))
         st.dataframe(data=analysis_df, hide_index=True,
                         column_config={
                         "Incident_File": None,
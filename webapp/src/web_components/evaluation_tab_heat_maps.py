@@ -1,15 +1,23 @@
 import logging
 from calendar import monthrange
-from datetime import date
 import streamlit as st
 import pandas as pd
 from dateutil.relativedelta import relativedelta
+from utils.heat_map_rollups import build_heat_map_rollups
+from utils.prefetch_cache import PrefetchCache
+from utils.space_analysis import load_analysis, count_undated_analysis
 from web_components.widget_heatmap_grid import show_heatmap_grid_widget
+from web_components.widget_month_range import list_months, select_month_range_widget
 
 logger = logging.getLogger(__name__)
 
 MAX_ROWS = 20
 PIVOT_DATE_COLUMN = "Date_Reported"
+DEFAULT_MONTHS = 3
+PREFETCH_MONTHS = 1
+
+# heat map months shared across reruns and sessions, neighbors are built in the background
+month_cache = PrefetchCache(max_workers=2, max_entries=512)
 
 """
 0   Incident_File      5 non-null      object
@@ -26,97 +34,136 @@ PIVOT_DATE_COLUMN = "Date_Reported"
 11  Count_by_Category  5 non-null      int64 
 """
 
-def render_heat_map(title, pivot_entity_type, pivot_column, sample_date, df):
-    # validate that key columns exist before trying to render
-    if not PIVOT_DATE_COLUMN in df.columns:
-        st.write("Unsupported Data Import version.  Skipping heatmap render.")
-        return
-
+def build_heat_map_counts(rollups, pivot_column, date_from=None, date_to=None):
+    """ Pivots the daily rollups of a dimension into counts per value and day for every
+        month in a single pass.
+
+        rollups - heat map rollups (Dimension/Value/Date/Count)
+        pivot_column - dimension to pivot on
+        date_from - earliest date to include (None for no lower bound)
+        date_to - latest date to include (None for no upper bound)
+
+        Returns: data frame indexed by (Month, pivot value) with a column per day of month
+    """
+    mask = rollups['Dimension'] == pivot_column
+    if date_from is not None:
+        mask &= rollups['Date'] >= pd.Timestamp(date_from)
+    if date_to is not None:
+        mask &= rollups['Date'] <= pd.Timestamp(date_to)
+    rollups = rollups[mask]
+    dates = rollups['Date']
+    keys = [dates.dt.to_period('M').rename('Month'), rollups['Value'], dates.dt.day.rename('Day')]
+    counts = rollups.groupby(keys, observed=True)['Count'].sum()
+    return counts.unstack('Day', fill_value=0)
+
+def build_heat_map_month(sample_date, counts):
+    """ Builds the heat map for a single month.
+
+        sample_date - any date within the month to build
+        counts - daily counts as returned by build_heat_map_counts
+
+        Returns: (year, month, row labels, daily count matrix)
+    """
     month = sample_date.month
     year = sample_date.year
     days_in_month = monthrange(year, month)[1]
+    days = list(range(1, days_in_month + 1))
+
+    # slice month from the precomputed counts (PivotColumn x Day)
+    period = pd.Period(year=year, month=month, freq='M')
+    if period in counts.index.get_level_values('Month'):
+        grid = counts.xs(period, level='Month')
+    else:
+        grid = pd.DataFrame([], columns=days)
+    grid = grid.reindex(columns=days, fill_value=0)
+
+    # select the top rows by total count
+    totals = grid.sum(axis=1)
+    grid = grid.assign(Total=totals)[totals > 0]
+    grid = grid.rename_axis('Pivot').reset_index()
+    grid = grid.sort_values(by=['Total', 'Pivot'], ascending=[False, True]).head(MAX_ROWS)
+
+    return year, month, grid['Pivot'].tolist(), grid[days].to_numpy(dtype='int64')
+
+
+def get_heat_map_month(cache_key, rollups, pivot_column, month_start, prefetch=False):
+    """ Gets the heat map for a single month from the month cache, building it from the
+        rollups of that month only when needed.
+
+        cache_key - identifies the space and analysis the rollups belong to
+        rollups - heat map rollups (Dimension/Value/Date/Count)
+        pivot_column - dimension to pivot on
+        month_start - first day of the month
+        prefetch - build the month in the background instead of waiting for it
+
+        Returns: (year, month, row labels, daily count matrix), None when prefetching
+    """
+    month_end = month_start + relativedelta(months=1, days=-1)
+
+    def build_month():
+        counts = build_heat_map_counts(rollups, pivot_column, month_start, month_end)
+        return build_heat_map_month(month_start, counts)
 
-    # prepare core dataframe (PivotColumn/Date/Count)
-    df['Date'] = pd.to_datetime(df[PIVOT_DATE_COLUMN]).dt.normalize()
-    df = df[(df['Date'] >= f"{year}-{month}-1") & (df['Date'] <= f"{year}-{month}-{days_in_month}")]
-    df = df[[pivot_column, 'Date']]
-    df = df.groupby([pivot_column, 'Date']).size().reset_index(name='Count')
-    logging.info("Refined Data Frame: %s", df.info())
-
-    # append total count (Asset/Count)
-    df['Total'] = df.groupby(pivot_column)['Count'].transform('sum')
-
-    # sort data frame
-    df = df.sort_values(by=['Total', pivot_column, 'Date'], ascending=[False, True, True])
-
-    # build header
-    header = [pivot_entity_type]
-    for i in range(days_in_month):
-        header.append(str(i + 1))
-    header.append("Count")
-
-    # build asset rows
-    rows = []
-    prior_row = None
-    for index, row in df.iterrows():
-        # collect data points
-        pivot = row[pivot_column]
-        date = row["Date"]
-        date_count = row["Count"]
-        total = row["Total"]
-
-        # create new row?
-        if prior_row is not None and prior_row[0] != pivot:
-            prior_row = None
-
-        # build new row
-        if prior_row is None:
-            # have we hit the max row count?
-            if len(rows) >= MAX_ROWS:
-                break
-
-            # create new row
-            pivot_row = [pivot]
-            for i in range(days_in_month):
-                cell_value = None
-                if date.day == i:
-                    cell_value = date_count
-                pivot_row.append(cell_value)
-            pivot_row.append(total)
-
-            rows.append(pivot_row)
-            prior_row = pivot_row
-        
-        # update existing
-        else:
-            prior_row[date.day + 1] = date_count
-
-    # display heatmap
-    show_heatmap_grid_widget(f"{title}", year, month, header, rows)
+    key = (cache_key, pivot_column, month_start)
+    if prefetch:
+        month_cache.prefetch(key, build_month)
+        return None
+    return month_cache.get(key, build_month)
+
+
+def load_heat_map_rollups(space_id, rollups):
+    """ Loads the heat map rollups along with the number of incidents without a report
+        date, without reading the analysis rows.  Spaces analyzed before the rollups and
+        monthly partitions were saved are rolled up from the whole analysis.
+
+        space_id - space id
+        rollups - rollups saved with the analysis (None if not saved)
+
+        Returns: (rollups, undated incident count), None if the analysis has no report date
+    """
+    undated_count = count_undated_analysis(space_id)
+    if rollups is not None and undated_count is not None:
+        return rollups, undated_count
+
+    logger.info("No saved heat map rollups.  Building from analysis.  Space=%s", space_id)
+    df = load_analysis(space_id)
+    if df is None or PIVOT_DATE_COLUMN not in df.columns:
+        return None
+    return build_heat_map_rollups(df), int(df[PIVOT_DATE_COLUMN].isna().sum())
 
 
 def view_evaluation_heat_map(space_id, command):
-    # retrieve data set
-    df = command.analysis_df
-    if df is None or len(df) == 0:
+    # validate that the space has been analyzed
+    if command.analysis_filename is None:
         st.write("Please run the analysis tool first.")
         return
-    
-    # prepare dataframe for date analysis
-    prior_count = len(df)
-    df = df.dropna(subset=[PIVOT_DATE_COLUMN])
-    if len(df) != prior_count:
-        msg = f"WARNING: Dropped {prior_count - len(df)} rows from data set that had no value for '{PIVOT_DATE_COLUMN}' column."
+
+    # retrieve the daily rollups rather than the analysis rows
+    cache_key = (space_id, str(command.metadata.last_analysis_date))
+    loaded = month_cache.get((cache_key, "rollups"),
+                             lambda: load_heat_map_rollups(space_id, command.heat_map_rollups))
+
+    # validate that key columns exist before trying to render
+    if loaded is None:
+        st.write("Unsupported Data Import version.  Skipping heatmap render.")
+        return
+    rollups, undated_count = loaded
+
+    # report incidents that cannot be placed on a heat map
+    if undated_count > 0:
+        msg = f"WARNING: Dropped {undated_count} rows from data set that had no value for '{PIVOT_DATE_COLUMN}' column."
         logger.warning(msg)
         st.markdown(f":red[**{msg}**]")
-    if len(df) == 0:
+
+    # validate that the rollups have data
+    if len(rollups) == 0:
         logger.warning("Data Set has no data to process in heat map view")
         st.markdown("I'm sorry but this data set has no data to analyze.\n\nThis may be due to the analysis process not running first or an issue with the AI model analyzing the raw data.")
         return
 
     # setup date range
-    min_date = pd.to_datetime(df[PIVOT_DATE_COLUMN]).min()
-    max_date = pd.to_datetime(df[PIVOT_DATE_COLUMN]).max()
+    min_date = rollups['Date'].min()
+    max_date = rollups['Date'].max()
 
     # setup radio button labels
     RADIO_LABEL_TOP_CIS = "Top Config Items"
@@ -128,15 +175,31 @@ def view_evaluation_heat_map(space_id, command):
             horizontal=True
     )
 
-    loop_date = date(min_date.year, min_date.month, 1)
-    while loop_date <= max_date.date():
-        # render heat map for month
-        if heat_map_type == RADIO_LABEL_BY_CATEGORY:
-            render_heat_map("Classified Incident Heat Map", "Issue Type", "Category", loop_date, df)
-        elif heat_map_type == RADIO_LABEL_BY_SUBCATEGORY:
-            render_heat_map("Classified Incident Heat Map", "Issue Type", "Subcategory", loop_date, df)
-        else:
-            render_heat_map(f"Top {MAX_ROWS} Incident Heat Map", "Config Item", "Asset", loop_date, df)
-
-        # add month to loop date
-        loop_date = loop_date + relativedelta(months=1)
+    # select the dimension to pivot on
+    if heat_map_type == RADIO_LABEL_BY_CATEGORY:
+        title, pivot_entity_type, pivot_column = "Classified Incident Heat Map", "Issue Type", "Category"
+    elif heat_map_type == RADIO_LABEL_BY_SUBCATEGORY:
+        title, pivot_entity_type, pivot_column = "Classified Incident Heat Map", "Issue Type", "Subcategory"
+    else:
+        title, pivot_entity_type, pivot_column = f"Top {MAX_ROWS} Incident Heat Map", "Config Item", "Asset"
+
+    # select the months to display, defaulting to the most recent ones
+    month_options = list_months(min_date.date(), max_date.date())
+    start_index, end_index = select_month_range_widget(month_options, DEFAULT_MONTHS,
+                                                       key="heat_map_months")
+
+    # build only the selected months, concurrently
+    selected_months = month_options[start_index:end_index + 1]
+    for month_start in selected_months:
+        get_heat_map_month(cache_key, rollups, pivot_column, month_start, prefetch=True)
+    months = [get_heat_map_month(cache_key, rollups, pivot_column, month_start)
+              for month_start in selected_months]
+
+    # build neighboring months in the background so paging is immediate
+    neighbors = month_options[max(0, start_index - PREFETCH_MONTHS):start_index] + \
+                month_options[end_index + 1:end_index + 1 + PREFETCH_MONTHS]
+    for month_start in neighbors:
+        get_heat_map_month(cache_key, rollups, pivot_column, month_start, prefetch=True)
+
+    # display the selected months in a single heat map component
+    show_heatmap_grid_widget(title, pivot_entity_type, months)
@@ -3,9 +3,12 @@ from datetime import date, timedelta
 from io import StringIO
 import streamlit as st
 from gateways.object_storage_gateway import ObjectStorageGateway
+from gateways.snow_gateway import ServiceNowGateway
 from commands.from_snow import FromServiceNowCommand
+from utils.dedup_index import line_identity, update_dedup_index
+from utils.settings import settings
 
-def import_from_snow(space_id):
+def import_from_snow(space_id, metadata):
     """ Display form to import data from Service Now """
     col1, col2 = st.columns([0.275, 0.735])
 
@@ -35,12 +38,37 @@ def import_from_snow(space_id):
         width=510,
     )
 
+    # fields to pull
+    field_profile_labels = {
+        ServiceNowGateway.FIELD_PROFILE_CLASSIFICATION: "Classification fields (recommended)",
+        ServiceNowGateway.FIELD_PROFILE_FULL: "All fields (raw values)",
+    }
+    field_profiles = list(ServiceNowGateway.FIELD_PROFILES)
+    default_profile = settings.SERVICE_NOW_FIELD_PROFILE
+    field_profile = st.selectbox(
+        "Incident fields to import",
+        field_profiles,
+        index=field_profiles.index(default_profile) if default_profile in field_profiles else 0,
+        format_func=lambda profile: field_profile_labels.get(profile, profile),
+        width=510,
+    )
+
+    # only pull incidents created or updated since the last sync
+    sync_cursor = metadata.snow_sync_cursor if metadata is not None else None
+    sync_help = "The date range only applies to the first sync of a space."
+    if sync_cursor is not None and len(sync_cursor.updated_on) > 0:
+        sync_help = f"Last synced incidents updated through {sync_cursor.updated_on} UTC.  " + sync_help
+    incremental = st.checkbox("Only new or updated incidents since the last sync",
+                              value=sync_cursor is not None, help=sync_help)
+
     # submit button
     if st.button("Download from Service Now", type="primary"):
         from_snow_command = FromServiceNowCommand()
         from_snow_command.space_id = space_id
         from_snow_command.min_create_date = start_date
         from_snow_command.max_create_date = end_date
+        from_snow_command.field_profile = field_profile
+        from_snow_command.incremental = incremental
         from_snow_command.row_limit = -1
         if limit_results == limit_option_testing:
             from_snow_command.row_limit = 1
@@ -48,8 +76,18 @@ def import_from_snow(space_id):
             from_snow_command.row_limit = 10
         elif limit_results != limit_option_all and limit_results is not None:
             from_snow_command.row_limit = int(limit_results)
+        progress_bar = st.progress(0.0, text="Downloading incidents...")
+        def update_progress(processed, total):
+            progress_bar.progress(min(1.0, processed / max(total, 1)),
+                                  text=f"Downloaded {processed} of {total} incidents...")
+        from_snow_command.fn_progress = update_progress
         from_snow_command.go()
-        st.success("Successfully imported data from Service-Now!")
+        if from_snow_command.row_count == 0:
+            st.info("No new or updated incidents since the last sync.")
+        else:
+            st.success(f"Successfully imported {from_snow_command.row_count} incidents from Service-Now!")
+        if from_snow_command.duplicate_count > 0:
+            st.write(f"Skipped {from_snow_command.duplicate_count} incidents that were already imported.")
 
 
 def import_file(space_id):
@@ -75,6 +113,11 @@ def import_file(space_id):
             path = f"{space_id}/raw/{csv_file.name}"
             gateway.upload(path, csv_file_contents)
 
+            # index incidents so copies uploaded in other files are analyzed once
+            lines = csv_file_contents.encode("utf-8").splitlines()
+            update_dedup_index(space_id, path,
+                               (line_identity(line.decode("utf-8")) for line in lines))
+
             st.success("File Saved in Space!")
 
 def view_evaluation_import(space_id, command):
@@ -95,6 +138,6 @@ def view_evaluation_import(space_id, command):
 
     # display appropriate web form
     if data_set_source_radio == snow_option:
-        import_from_snow(space_id)
+        import_from_snow(space_id, command.metadata)
     elif data_set_source_radio == file_option:
         import_file(space_id)
@@ -3,6 +3,11 @@ import plotly.express as px
 import plotly.graph_objects as go
 from web_components.widget_category_scatterplot import show_category_scatterplot_widget
 
+MAX_SCATTERPLOT_ASSETS = 100
+
+# analysis columns read by the summary tab
+SUMMARY_COLUMNS = ["Asset", "Category"]
+
 def view_evaluation_summary(space_id, command):
     # load the space metadata file
     metadata = command.metadata
@@ -14,7 +19,7 @@ def view_evaluation_summary(space_id, command):
         # display scatter plot for analysis data
         df = command.analysis_df
         if df is not None:
-            show_category_scatterplot_widget(df)
+            show_category_scatterplot_widget(df, MAX_SCATTERPLOT_ASSETS)
 
         # display executive summary
         st.write(metadata.summary)
@@ -4,10 +4,30 @@ import plotly.express as px
 
 logger = logging.getLogger(__name__)
 
-def show_category_scatterplot_widget(df):
+def build_category_counts(df, max_assets=None):
+    """ Counts incidents per (Asset, Category) pair.
+
+        df - analysis dataframe
+        max_assets - only keep the assets with the most incidents (None for all assets)
+
+        Returns: data frame with Asset, Category and Count columns
+    """
+    counts = df.groupby(['Asset', 'Category'], observed=True).size().rename('Count').reset_index()
+    counts = counts[counts['Count'] > 0]
+
+    # keep the assets with the most incidents
+    if max_assets is not None:
+        totals = counts.groupby('Asset', observed=True)['Count'].sum()
+        top_assets = totals.nlargest(max_assets).index
+        counts = counts[counts['Asset'].isin(top_assets)]
+
+    return counts.reset_index(drop=True)
+
+def show_category_scatterplot_widget(df, max_assets=None):
     """ Display a scatterplot that shows ticket count density by category type.
     
         df - analysis dataframe
+        max_assets - only plot the assets with the most incidents (None for all assets)
     """
     # validate arguments
     if df is None:
@@ -18,19 +38,16 @@ def show_category_scatterplot_widget(df):
     # disallow empty data frames
     if len(df) == 0:
         logger.warning("Input DataFrame cannot be empty for widget to render.")
+    elif not 'Asset' in df.columns or not 'Category' in df.columns:
+        logger.warning("Input DataFrame has no Asset or Category column.  Skipping graph rendering...")
     else:
-        # create summary dataframe
-        df.info()
-        df['Count_by_Category'] = df.groupby('Category')['Category'].transform('count')
-
-        # handle situations where nan is pervasive in the data to be plotted
-        logger.info("BEFORE CLEANSE...  Shape=%s. Head=%s", df.shape, df.head())
-        df = df.dropna(thresh=(len(df.columns) - 7))
-        logger.info("AFTER CLEANSE...  Shape=%s. Head=%s", df.shape, df.head())
-        if len(df) == 0:
-            logger.warning("DataFrame is empty after cleansing NaNs.  Skipping graph rendering...")
+        # create summary dataframe with one point per (Asset, Category)
+        counts = build_category_counts(df, max_assets)
+        logger.info("Category counts.  Incidents=%s Points=%s", len(df), len(counts))
+        if len(counts) == 0:
+            logger.warning("No incidents have both an asset and category.  Skipping graph rendering...")
         else:
             # display new dataframe
-            fig = px.scatter(df, x="Asset", y="Category",
-                            size="Count_by_Category")
+            fig = px.scatter(counts, x="Asset", y="Category",
+                            size="Count", render_mode="webgl")
             st.plotly_chart(fig, key="Category", on_select="rerun")
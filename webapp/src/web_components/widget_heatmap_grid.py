@@ -1,19 +1,15 @@
 from calendar import month_name
+from html import escape
+import numpy as np
 import streamlit as st
 import streamlit.components.v1 as components
-from pandas import DataFrame
 
-def show_heatmap_grid_widget(title, year, month, header, rows,
-                             threshold_low=1, threshold_medium=2, threshold_high=3):
-    """ Renders a heat map grid
-    
-        header - header columns
-        rows - list of rows
-    """
+MONTH_TITLE_HEIGHT = 44
+ROW_HEIGHT = 18
+MONTH_MARGIN = 16
+MAX_HEIGHT = 900
 
-    st.header(f"{title} ({month_name[month]} {year})")
-
-    html = """
+STYLE = """
     <style>
         .gridComponent {
             font-family: "Verdana", sans-serif;
@@ -21,6 +17,14 @@ def show_heatmap_grid_widget(title, year, month, header, rows,
 
             align: center;
         }
+        .gridMonth {
+            content-visibility: auto;
+            margin-bottom: 16px;
+        }
+        .gridMonth h3 {
+            font-size: 16px;
+            margin: 8px 0;
+        }
         .gridComponent table {
             width: 100%;
             border-collapse: collapse;
@@ -56,66 +60,72 @@ def show_heatmap_grid_widget(title, year, month, header, rows,
             background-color: lightgreen;
         }
     </style>
-    <div id="grid" class="gridComponent">
-        <table>
+"""
+
+def month_height(matrix) -> int:
+    """ Estimates the rendered height of a month in pixels.
+
+        matrix - daily counts for the month
     """
-    
-    # display header
-    if header is not None and len(header) > 0:
-        html += """
-        <thead>
-            <tr>
-        """
-        for h in header:
-            html += f"<td>{h}</td>"
-        html += """
-            </tr>
-        </thead>
-        """
+    return MONTH_TITLE_HEIGHT + ROW_HEIGHT * (len(matrix) + 1) + MONTH_MARGIN
 
-    # display rows
-    if rows is not None and len(rows) > 0:
-        html += """
-        <tbody>
-        """
-        for r in rows:
-            html += "<tr>"
-            for i in range(len(r)):
-                val_str = ""
-                val_class = ""
-                val = r[i]
+def build_month_html(pivot_entity_type, year, month, labels, matrix,
+                     threshold_low, threshold_medium, threshold_high) -> str:
+    """ Builds the table for a single month.
 
-                # trailing column
-                if i == (len(r) - 1):
-                    val_class = " class=\"gridStrong\""
-                    if val is not None:
-                        val_str = val
+        pivot_entity_type - header for the label column
+        year - year
+        month - month (1-12)
+        labels - row labels
+        matrix - daily counts (rows x days), zero for days without incidents
+    """
+    matrix = np.asarray(matrix, dtype=np.int64)
+    days = matrix.shape[1]
 
-                # number
-                elif val is not None and (type(val) == int or \
-                    (type(val) == str and val.isdigit())):
-                    val_str = val
-                    if int(val) >= threshold_high:
-                        val_class = " class=\"gridCellHigh\""
-                    elif int(val) >= threshold_medium:
-                        val_class = " class=\"gridCellMedium\""
-                    elif int(val) >= threshold_low:
-                        val_class = " class=\"gridCellLow\""
-            
-                # string
-                elif val is not None:
-                    val_str = val
+    # compute cell classes and text for the whole month at once
+    classes = np.select([matrix >= threshold_high,
+                         matrix >= threshold_medium,
+                         matrix >= threshold_low],
+                        ["<td class=\"gridCellHigh\">",
+                         "<td class=\"gridCellMedium\">",
+                         "<td class=\"gridCellLow\">"],
+                        default="<td>")
+    text = np.where(matrix > 0, matrix.astype(str), "")
+    cells = np.char.add(np.char.add(classes, text), "</td>")
+    totals = matrix.sum(axis=1)
 
-                html += f"<td{val_class}>{val_str}</td>"
-            html += "</tr>"
-        html += """
-        </tbody>
-        """
-    
-    # close out html
-    html += """
-        </table>
-    </div>
+    # build header
+    header = [escape(str(pivot_entity_type))] + [str(day) for day in range(1, days + 1)] + ["Count"]
+    header_html = "<thead><tr><td>" + "</td><td>".join(header) + "</td></tr></thead>"
+
+    # build rows
+    rows_html = [
+        f"<tr><td>{escape(str(label))}</td>{''.join(row_cells)}<td class=\"gridStrong\">{total}</td></tr>"
+        for label, row_cells, total in zip(labels, cells.tolist(), totals.tolist())
+    ]
+
+    height = month_height(matrix)
+    return (f"<section class=\"gridMonth\" style=\"contain-intrinsic-size: auto {height}px\">"
+            f"<h3>{month_name[month]} {year}</h3>"
+            f"<table>{header_html}<tbody>{''.join(rows_html)}</tbody></table></section>")
+
+def show_heatmap_grid_widget(title, pivot_entity_type, months,
+                             threshold_low=1, threshold_medium=2, threshold_high=3):
+    """ Renders heat map grids for several months in a single component.  Months
+        scrolled out of view are not laid out or painted until they are needed.
+
+        title - heat map title
+        pivot_entity_type - header for the label column
+        months - list of (year, month, labels, matrix) tuples where matrix holds the
+                 daily counts for each label (rows x days)
     """
-    
-    components.html(html)
+    st.header(title)
+
+    sections = [build_month_html(pivot_entity_type, year, month, labels, matrix,
+                                 threshold_low, threshold_medium, threshold_high)
+                for year, month, labels, matrix in months]
+    html = STYLE + "<div id=\"grid\" class=\"gridComponent\">" + "".join(sections) + "</div>"
+
+    # scroll within the component for long ranges so off-screen months stay lazy
+    height = sum(month_height(matrix) for _, _, _, matrix in months)
+    components.html(html, height=min(height, MAX_HEIGHT), scrolling=height > MAX_HEIGHT)
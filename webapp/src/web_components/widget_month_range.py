@@ -0,0 +1,37 @@
+from datetime import date
+import streamlit as st
+from dateutil.relativedelta import relativedelta
+
+def list_months(min_date, max_date) -> list[date]:
+    """ Lists the first day of every month between two dates.
+
+        min_date - earliest date
+        max_date - latest date
+    """
+    months = []
+    loop_date = date(min_date.year, min_date.month, 1)
+    while loop_date <= max_date:
+        months.append(loop_date)
+
+        # add month to loop date
+        loop_date = loop_date + relativedelta(months=1)
+    return months
+
+def select_month_range_widget(months, default_months, key):
+    """ Display a slider selecting a range of months, defaulting to the most recent ones.
+
+        months - first day of each month that can be selected
+        default_months - number of months selected by default
+        key - unique widget key
+
+        Returns: (index of first selected month, index of last selected month)
+    """
+    selected = (months[0], months[-1])
+    if len(months) > 1:
+        default_start = months[max(0, len(months) - default_months)]
+        selected = st.select_slider("Months:",
+                                    options=months,
+                                    value=(default_start, months[-1]),
+                                    format_func=lambda d: d.strftime("%b %Y"),
+                                    key=key)
+    return months.index(selected[0]), months.index(selected[1])